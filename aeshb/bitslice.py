@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+import argparse
+import time
+
+import numpy as np
+
+from aeshb.simpleaes import SimpleAES
+from aeshb.utils import bit_transpose
+
+
+def rom256x8_masks(init):
+    # Same decomposition as ROM256x8: entries are packed in pairs into a
+    # 128x16 ROM addressed by addr[1:], built from eight ROM16x16 leaves on
+    # addr[1:5]. masks[leaf][bit] is the LUT4 mask of that leaf output bit.
+    assert len(init) == 256
+    words = [init[2 * k] | (init[2 * k + 1] << 8) for k in range(128)]
+    return bit_transpose(words, 16, 16)
+
+
+def to_planes(blocks):
+    blocks = np.ascontiguousarray(blocks, dtype=np.uint8).reshape(-1, 16)
+    bits = np.unpackbits(blocks[:, :, None], axis=2, bitorder="little")
+    packed = np.packbits(bits.transpose(1, 2, 0), axis=2, bitorder="little")
+    return [[int.from_bytes(packed[p, b].tobytes(), "little") for b in range(8)] for p in range(16)]
+
+
+def from_planes(planes, nblocks):
+    nbytes = (nblocks + 7) // 8
+    raw = np.frombuffer(b"".join(plane.to_bytes(nbytes, "little") for pos in planes for plane in pos),
+                        dtype=np.uint8).reshape(16, 8, nbytes)
+    bits = np.unpackbits(raw, axis=2, count=nblocks, bitorder="little")
+    return np.packbits(bits.transpose(2, 0, 1), axis=2, bitorder="little").reshape(nblocks, 16)
+
+
+# The state is eight ints, one per bit, each holding all 16 byte positions
+# as segments of `width` lanes, row-major: position 4 * c + r in segment
+# 4 * r + c. ShiftRows and the MixColumns row rotations are then shifts.
+ROWMAJOR = tuple(4 * c + r for r in range(0, 4) for c in range(0, 4))
+
+
+def to_state(blocks):
+    blocks = np.ascontiguousarray(blocks, dtype=np.uint8).reshape(-1, 16)
+    bits = np.unpackbits(blocks[:, ROWMAJOR, None], axis=2, bitorder="little")
+    packed = np.packbits(bits.transpose(2, 1, 0).reshape(8, -1), axis=1, bitorder="little")
+    return [int.from_bytes(row.tobytes(), "little") for row in packed]
+
+
+def from_state(state, nblocks):
+    raw = np.frombuffer(b"".join(x.to_bytes(2 * nblocks, "little") for x in state), dtype=np.uint8)
+    bits = np.unpackbits(raw.reshape(8, -1), axis=1, bitorder="little").reshape(8, 16, nblocks)
+    blocks = np.empty((nblocks, 16), dtype=np.uint8)
+    blocks[:, ROWMAJOR] = np.packbits(bits.transpose(2, 1, 0), axis=2, bitorder="little").reshape(nblocks, 16)
+    return blocks
+
+
+def shift_rows(state, width):
+    # Row r rotates by r columns towards column 0.
+    row = (1 << (4 * width)) - 1
+    out = []
+    for x in state:
+        v = x & row
+        for r in range(1, 4):
+            y = (x >> (4 * width * r)) & row
+            v |= (((y >> (width * r)) | (y << (width * (4 - r)))) & row) << (4 * width * r)
+        out.append(v)
+    return out
+
+
+def rotate_rows(state, k, width):
+    # Row r of the result is row r + k of the state, as a[(r + k) % 4].
+    full = (1 << (16 * width)) - 1
+    return [(x >> (4 * width * k)) | ((x << (4 * width * (4 - k))) & full) for x in state]
+
+
+def xtime(a):
+    return [a[7], a[0] ^ a[7], a[1], a[2] ^ a[7], a[3] ^ a[7], a[4], a[5], a[6]]
+
+
+def mix_columns(state, width):
+    a1, a2, a3 = (rotate_rows(state, k, width) for k in (1, 2, 3))
+    t = xtime([a ^ b for a, b in zip(state, a1)])
+    return [t[b] ^ a1[b] ^ a2[b] ^ a3[b] for b in range(8)]
+
+
+def mux(sel, lo, hi):
+    return lo ^ (sel & (lo ^ hi))
+
+
+class BitslicedAES:
+    # Software reference for the LUT-level S-box, checked against
+    # SimpleAES; bench/aes_throughput.py compares it with the NumPy batch
+    # path, which remains the faster one.
+    def __init__(self, init=SimpleAES.sbox):
+        self.init = tuple(init)
+        self.masks = rom256x8_masks(self.init)
+        # A leaf mask by addr[3:5] minterm, as the addr[1:3] minterms
+        # (a nibble) it is set for.
+        self.nibbles = [[[(self.masks[leaf][bit] >> (4 * k)) & 15 for k in range(4)] for leaf in range(8)]
+                        for bit in range(16)]
+        self.aes = SimpleAES()
+
+    def sbox_planes(self, x, ones):
+        # Every leaf is a LUT4 on addr[1:5]: the OR over the addr[3:5]
+        # minterms of that minterm AND a function of addr[1:3]. The 64
+        # products are shared by all 128 leaves.
+        n1, n2, n3, n4 = (x[i] ^ ones for i in range(1, 5))
+        lo = [n1 & n2, x[1] & n2, n1 & x[2], x[1] & x[2]]
+        hi = [n3 & n4, x[3] & n4, n3 & x[4], x[3] & x[4]]
+        funcs = [0] * 16
+        for n in range(1, 16):
+            low = n & -n
+            funcs[n] = funcs[n ^ low] | lo[low.bit_length() - 1]
+        products = [[h & f for f in funcs] for h in hi]
+        p0, p1, p2, p3 = products
+        words = []
+        for leaves in self.nibbles:
+            level = [p0[a] | p1[b] | p2[c] | p3[d] for a, b, c, d in leaves]
+            for sel in (x[5], x[6], x[7]):
+                level = [mux(sel, level[i], level[i + 1]) for i in range(0, len(level), 2)]
+            words.append(level[0])
+        return [mux(x[0], words[b], words[b + 8]) for b in range(8)]
+
+    def roundkey_states(self, key, nblocks):
+        if isinstance(key, np.ndarray) and key.ndim == 2:
+            rk = self.aes.expandkeys(key)
+            return [to_state(rk[:, i]) for i in range(rk.shape[1])]
+        if isinstance(key, np.ndarray):
+            key = key.tobytes()
+        rk = self.aes.keyschedule(key).roundkey_bytes
+        segments = [((1 << nblocks) - 1) << (nblocks * k) for k in range(16)]
+        return [[sum(segments[k] for k, p in enumerate(ROWMAJOR) if (rk[16 * i + p] >> b) & 1) for b in range(8)]
+                for i in range(len(rk) // 16)]
+
+    def encblocks(self, blocks, key):
+        blocks = np.ascontiguousarray(blocks, dtype=np.uint8).reshape(-1, 16)
+        nblocks = len(blocks)
+        ones = (1 << (16 * nblocks)) - 1
+        rk = self.roundkey_states(key, nblocks)
+        s = [a ^ k for a, k in zip(to_state(blocks), rk[0])]
+        for i in range(1, len(rk)):
+            s = shift_rows(self.sbox_planes(s, ones), nblocks)
+            if i != len(rk) - 1:
+                s = mix_columns(s, nblocks)
+            s = [a ^ k for a, k in zip(s, rk[i])]
+        return from_state(s, nblocks)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--blocks", type=int, default=4096)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+    pts = rng.integers(0, 256, size=(args.blocks, 16), dtype=np.uint8)
+    key = rng.integers(0, 256, size=16, dtype=np.uint8).tobytes()
+    bs = BitslicedAES()
+    t0 = time.perf_counter()
+    ct = bs.encblocks(pts, key)
+    print(f"bitsliced reference model: {args.blocks / (time.perf_counter() - t0):.1f} blocks/s")
+    assert np.array_equal(ct, SimpleAES().encblocks(pts, key))
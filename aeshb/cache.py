@@ -0,0 +1,180 @@
+# nmigen: UnusedElaboratable=no
+import argparse
+import functools
+import hashlib
+import inspect
+import json
+import os
+import re
+import tempfile
+import time
+
+import nmigen
+import numpy as np
+from nmigen import *
+from nmigen.back import rtlil, verilog
+
+from aeshb.resources import Resources
+
+DEFAULT_CACHE_DIR = os.environ.get("AESHB_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "aeshb"))
+
+FORMATS = {"rtlil": ("il", rtlil.convert), "verilog": ("v", verilog.convert)}
+
+
+@functools.lru_cache(maxsize=None)
+def tool_version():
+    # nmigen plus the generator sources: editing any module in aeshb
+    # invalidates every entry.
+    h = hashlib.sha256(f"nmigen {nmigen.__version__}".encode())
+    root = os.path.dirname(os.path.abspath(__file__))
+    for name in sorted(os.listdir(root)):
+        if name.endswith(".py"):
+            with open(os.path.join(root, name), "rb") as f:
+                h.update(name.encode() + b"\0" + f.read())
+    return h.hexdigest()
+
+
+def _normalize(value):
+    if isinstance(value, type):
+        return f"{value.__module__}.{value.__qualname__}"
+    if isinstance(value, Value):
+        return ["value", len(value)]
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    if isinstance(value, (bytes, bytearray, range)):
+        return list(value)
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in sorted(value.items())}
+    assert value is None or isinstance(value, (bool, int, float, str)), f"cannot key {value!r}"
+    return value
+
+
+def constructor_args(cls, args=(), kwargs=None):
+    # The arguments cls would be built with, by parameter name and with
+    # the defaults filled in, so that spelling out a default does not
+    # change the key. Signals are keyed by width; their names go in
+    # through the ports.
+    bound = inspect.signature(cls.__init__).bind(None, *args, **(kwargs or {}))
+    bound.apply_defaults()
+    return {name: _normalize(value) for name, value in list(bound.arguments.items())[1:]}
+
+
+def design_params(cls, args=(), kwargs=None, ports=()):
+    # Everything that determines the netlist of cls(*args, **kwargs), known
+    # before building it. ports are port names.
+    return {"class": _normalize(cls), "args": constructor_args(cls, args, kwargs), "ports": list(ports)}
+
+
+def cache_key(cls, args=(), kwargs=None, ports=(), fmt="rtlil"):
+    params = json.dumps(design_params(cls, args, kwargs, ports), sort_keys=True)
+    return hashlib.sha256(f"{tool_version()}\0{fmt}\0{params}".encode()).hexdigest()
+
+
+def _write_atomic(path, text):
+    # Concurrent sweep jobs may race on the same entry; the last rename wins
+    # and every reader sees a complete file.
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _has_input(text, port):
+    # Matches both "input clk;" (Verilog) and "wire input 2 \clk" (RTLIL).
+    return re.search(rf"^\s*(wire\b.*)?\binput\b.*[\s\\]{port}\s*;?\s*$", text, re.M) is not None
+
+
+def module_name(cls, args=(), kwargs=None, ports=(), fmt="rtlil"):
+    return f"aeshb_{cache_key(cls, args, kwargs, ports, fmt)[:16]}"
+
+
+def _build(cls, args, kwargs, ports):
+    # The design and its port signals by name, on a miss only.
+    design = cls(*args, **(kwargs or {}))
+    by_name = {p.name: p for p in design.ports()}
+    return design, [by_name[name] for name in ports]
+
+
+def _store_report(design, params, path):
+    res = design.resources()
+    _write_atomic(path, json.dumps({"params": params, "resources": res._asdict()}))
+    return res
+
+
+def convert(cls, args=(), kwargs=None, ports=(), fmt="rtlil", name=None, cache_dir=DEFAULT_CACHE_DIR):
+    # RTLIL/Verilog for cls(*args, **kwargs) with the named ports, generated
+    # once per (class, arguments, ports, tool version). The design is only
+    # built on a miss. Returns the text.
+    ext, converter = FORMATS[fmt]
+    key = cache_key(cls, args, kwargs, ports, fmt)
+    name = name or f"aeshb_{key[:16]}"
+    path = os.path.join(cache_dir, f"{key}.{name}.{ext}")
+    text = _read(path)
+    if text is None:
+        design, design_ports = _build(cls, args, kwargs, ports)
+        report_path = os.path.join(cache_dir, f"{cache_key(cls, args, kwargs, fmt='report')}.json")
+        if _read(report_path) is None:
+            _store_report(design, design_params(cls, args, kwargs), report_path)
+        text = converter(design, name=name, ports=design_ports)
+        _write_atomic(path, text)
+    return text
+
+
+def report(cls, args=(), kwargs=None, cache_dir=DEFAULT_CACHE_DIR):
+    # Resource report stored next to the netlists, with the parameters it
+    # was computed for. A miss builds the design only to estimate it,
+    # which this file's linter header keeps nmigen quiet about.
+    path = os.path.join(cache_dir, f"{cache_key(cls, args, kwargs, fmt='report')}.json")
+    text = _read(path)
+    if text is not None:
+        return Resources(**json.loads(text)["resources"])
+    return _store_report(cls(*args, **(kwargs or {})), design_params(cls, args, kwargs), path)
+
+
+def instance(cls, args=(), kwargs=None, inputs=(), outputs=(), platform=None, cache_dir=DEFAULT_CACHE_DIR):
+    # Black-box Instance of the cached Verilog for cls(*args, **kwargs),
+    # connected by name to the given signals, which stand in for the
+    # design's ports of the same names. The Verilog is added to platform,
+    # so the toolchain builds it without the design being elaborated.
+    ports = [p.name for p in list(inputs) + list(outputs)]
+    name = module_name(cls, args, kwargs, ports, "verilog")
+    text = convert(cls, args, kwargs, ports, fmt="verilog", name=name, cache_dir=cache_dir)
+    if platform is not None:
+        platform.add_file(f"{name}.v", text)
+    conns = {f"i_{p.name}": p for p in inputs}
+    conns.update({f"o_{p.name}": p for p in outputs})
+    # The sync domain only becomes clk/rst ports if the design uses it.
+    if _has_input(text, "clk"):
+        conns["i_clk"] = ClockSignal()
+    if _has_input(text, "rst"):
+        conns["i_rst"] = ResetSignal()
+    return Instance(name, **conns)
+
+
+if __name__ == "__main__":
+    from aeshb.rom import ROM256x8
+    from aeshb.simpleaes import SimpleAES
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--format", choices=sorted(FORMATS), default="rtlil")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--pipelined", action="store_true")
+    args = parser.parse_args()
+    rom_args = (Signal(8, name="addr"), SimpleAES.sbox)
+    rom_kwargs = {"pipelined": args.pipelined}
+    for i in range(2):
+        t0 = time.perf_counter()
+        text = convert(ROM256x8, rom_args, rom_kwargs, ["addr", "data"], fmt=args.format, cache_dir=args.cache_dir)
+        print(f"{'cold' if i == 0 else 'warm'}: {time.perf_counter() - t0:.3f}s, {len(text)} bytes, "
+              f"{report(ROM256x8, rom_args, rom_kwargs, cache_dir=args.cache_dir)}")
@@ -0,0 +1,136 @@
+import functools
+
+import numpy as np
+
+
+# GF(2^4) = GF(2)[x] / (x^4 + x + 1); GF((2^4)^2) = GF(2^4)[y] / (y^2 + y +
+# LAMBDA). Composite elements are bytes (ah << 4) | al for ah * y + al.
+GF16_POLY = 0b10011
+AES_POLY = 0x11b
+
+
+def gf16_mul(a, b):
+    p = 0
+    for i in range(4):
+        if (b >> i) & 1:
+            p ^= a << i
+    for i in (6, 5, 4):
+        if (p >> i) & 1:
+            p ^= GF16_POLY << (i - 4)
+    return p
+
+
+GF16_INV = tuple(next((b for b in range(16) if gf16_mul(a, b) == 1), 0) for a in range(16))
+
+# Smallest lambda making y^2 + y + lambda irreducible, i.e. without a root.
+LAMBDA = next(l for l in range(1, 16) if all(gf16_mul(y, y) ^ y ^ l for y in range(16)))
+
+
+def composite_mul(a, b):
+    ah, al, bh, bl = a >> 4, a & 15, b >> 4, b & 15
+    hh = gf16_mul(ah, bh)
+    # y^2 = y + lambda
+    h = hh ^ gf16_mul(ah, bl) ^ gf16_mul(al, bh)
+    l = gf16_mul(hh, LAMBDA) ^ gf16_mul(al, bl)
+    return (h << 4) | l
+
+
+def _isomorphism():
+    # Maps AES byte bit i (x^i) to beta^i for the smallest root beta of the
+    # AES polynomial in the composite field.
+    def aes_poly(beta):
+        acc, power = 0, 1
+        for i in range(9):
+            if (AES_POLY >> i) & 1:
+                acc ^= power
+            power = composite_mul(power, beta)
+        return acc
+    beta = next(b for b in range(2, 256) if aes_poly(b) == 0)
+    basis, power = [], 1
+    for i in range(8):
+        basis.append(power)
+        power = composite_mul(power, beta)
+    to_composite = tuple(functools.reduce(lambda acc, i: acc ^ (basis[i] if (x >> i) & 1 else 0), range(8), 0)
+                         for x in range(256))
+    from_composite = [0] * 256
+    for x, c in enumerate(to_composite):
+        from_composite[c] = x
+    return to_composite, tuple(from_composite)
+
+
+TO_COMPOSITE, FROM_COMPOSITE = _isomorphism()
+
+
+def affine(x):
+    y = 0
+    for i in range(8):
+        b = 0
+        for k in (0, 4, 5, 6, 7):
+            b ^= (x >> ((i + k) % 8)) & 1
+        y |= b << i
+    return y ^ 0x63
+
+
+def inv_affine(y):
+    return next(x for x in range(256) if affine(x) == y)
+
+
+# The datapath as blocks of small tables, input bits LSB first:
+#   map:   byte -> (ah ^ al) << 8 | ah << 4 | al   (isomorphism; for the
+#          inverse S-box the inverse affine transform folded in front)
+#   delta: ah << 4 | al -> lambda ah^2 + ah al + al^2
+#   inv:   delta -> delta^-1 in GF(2^4)
+#   mul:   ah, s = ah ^ al, dinv -> (ah dinv) << 4 | s dinv
+#   out:   composite inverse -> byte   (back to the AES basis; for the
+#          forward S-box the affine transform folded in)
+def _with_sum(c):
+    return ((c >> 4) ^ (c & 15)) << 8 | c
+
+
+MAP = tuple(_with_sum(TO_COMPOSITE[x]) for x in range(256))
+INV_MAP = tuple(_with_sum(TO_COMPOSITE[inv_affine(x)]) for x in range(256))
+DELTA = tuple(gf16_mul(gf16_mul(h, h), LAMBDA) ^ gf16_mul(h, l) ^ gf16_mul(l, l)
+              for v in range(256) for h, l in [(v >> 4, v & 15)])
+INV = GF16_INV
+MUL = tuple(gf16_mul(v & 15, d) << 4 | gf16_mul(v >> 4, d) for w in range(4096)
+            for v, d in [(w & 0xff, w >> 8)])
+OUT = tuple(affine(FROM_COMPOSITE[c]) for c in range(256))
+INV_OUT = FROM_COMPOSITE
+
+
+def anf(table, nin):
+    # Algebraic normal form of every output bit: anf(...)[bit] is the set of
+    # monomials (input-bit masks) XORed together, 0 being the constant 1.
+    t = np.array(table, dtype=np.int64)
+    for i in range(nin):
+        step = 1 << i
+        idx = np.arange(len(t))
+        hi = (idx & step) != 0
+        t[hi] ^= t[idx[hi] ^ step]
+    nout = max(max(table).bit_length(), 1)
+    return tuple(frozenset(int(m) for m in np.nonzero((t >> b) & 1)[0]) for b in range(nout))
+
+
+def lut4_cost(monomials, inputs=4):
+    # LUT4s and levels for one XOR-of-monomials output: monomials are
+    # greedily packed into LUTs over at most `inputs` variables, then the
+    # partial sums are XORed by a tree of LUTs.
+    groups = []
+    for m in sorted(monomials, key=lambda m: -bin(m).count("1")):
+        for i, g in enumerate(groups):
+            if bin(g | m).count("1") <= inputs:
+                groups[i] |= m
+                break
+        else:
+            groups.append(m)
+    n = max(len(groups), 1)
+    luts, levels = n, 1
+    while n > 1:
+        n = -(-n // inputs)
+        luts += n
+        levels += 1
+    # A lone variable (or constant) is a wire.
+    if len(monomials) <= 1 and all(bin(m).count("1") <= 1 for m in monomials):
+        return 0, 0
+    return luts, levels
+
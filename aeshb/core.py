@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+import argparse
+
+import numpy as np
+from nmigen import *
+from nmigen.cli import main_parser, main_runner
+from nmigen.sim import Simulator, Settle
+
+from aeshb.composite import lut4_cost
+from aeshb.resources import Resources
+from aeshb.rom import delay
+from aeshb.sbox import SubBytes, subbytes_latency, subbytes_resources
+from aeshb.simpleaes import SimpleAES
+
+NROUNDS = 10
+
+# Byte 4 * c + r of a 128-bit state or key is row r of column c, the byte
+# order of SimpleAES.encrypt_block.
+
+
+def state_byte(state, i):
+    return state[8 * i:8 * i + 8]
+
+
+def shift_rows(state):
+    return Cat(*(state_byte(state, 4 * ((c + r) % 4) + r) for c in range(4) for r in range(4)))
+
+
+def xtime(b):
+    return Cat(b[7], b[0] ^ b[7], b[1], b[2] ^ b[7], b[3] ^ b[7], b[4], b[5], b[6])
+
+
+def mix_column(col):
+    a = [state_byte(col, r) for r in range(4)]
+    return Cat(*(xtime(a[r] ^ a[(r + 1) % 4]) ^ a[(r + 1) % 4] ^ a[(r + 2) % 4] ^ a[(r + 3) % 4] for r in range(4)))
+
+
+def mix_columns(state):
+    return Cat(*(mix_column(state[32 * c:32 * c + 32]) for c in range(4)))
+
+
+def rot_word(key):
+    # RotWord of the last key word, as the input of SubWord.
+    return Cat(*(state_byte(key, 12 + (r + 1) % 4) for r in range(4)))
+
+
+def next_key(key, sub_word, rcon):
+    words = [key[32 * c:32 * c + 32] for c in range(4)]
+    w = words[0] ^ sub_word ^ rcon
+    out = [w]
+    for c in range(1, 4):
+        w = words[c] ^ w
+        out.append(w)
+    return Cat(*out)
+
+
+def _xor_luts(fanin):
+    # Also used as the estimate for any function of `fanin` inputs.
+    return lut4_cost(frozenset(1 << i for i in range(fanin)))
+
+
+def round_resources(impl="m9k", rnd=None, **kwargs):
+    # AESRound's, from its parameters. The linear layers are estimated as
+    # XOR trees of their fan-in per bit; depth counts the S-box's last
+    # segment and the linear layer as one (an upper bound).
+    # MixColumns bit j: xtime of a two-byte sum takes bits j - 1 and 7
+    # (for j in 0, 1, 3, 4), then three more bytes; plus the round key
+    # bit, and the mux when the round is not fixed.
+    mux = 1 if rnd is None else 0
+    mix = [2 * ((j > 0) + (j in (0, 1, 3, 4))) + 3 + mux for j in range(8)]
+    if rnd == NROUNDS:
+        mix = [1] * 8
+    state = [_xor_luts(n + 1) for n in mix] * 16
+    key = [_xor_luts(c + 2) for c in range(4) for i in range(32)]
+    luts = sum(c for c, l in state + key)
+    levels = max(l for c, l in state + key)
+    sub = subbytes_resources(16, impl, **kwargs) + subbytes_resources(4, impl, **kwargs)
+    round_bits = Shape.cast(range(NROUNDS + 1)).width
+    delayed = (128 + (round_bits if rnd is None else 0) + 1) * subbytes_latency(impl, **kwargs)
+    registers = 128 + 128 + round_bits + 1 + delayed
+    return sub + Resources(luts, 0, registers, 0, 0, sub.depth + levels)
+
+
+class AESRound(Elaboratable):
+    # One encryption round and the key expansion step producing its round
+    # key, registered at the output. The round number is fixed (an unrolled
+    # pipeline) or taken from in_round (a unit that is looped through).
+    def __init__(self, impl="m9k", rnd=None, **kwargs):
+        assert rnd is None or 1 <= rnd <= NROUNDS
+        self.rnd = rnd
+        self.in_state = Signal(128, name="in_state")
+        self.in_key = Signal(128, name="in_key")
+        self.in_round = Signal(range(NROUNDS + 1), name="in_round")
+        self.in_valid = Signal(name="in_valid")
+        self.out_state = Signal(128, name="out_state", reset_less=True)
+        self.out_key = Signal(128, name="out_key", reset_less=True)
+        self.out_round = Signal(range(NROUNDS + 1), name="out_round", reset_less=True)
+        self.out_valid = Signal(name="out_valid")
+        self.impl = impl
+        self.kwargs = kwargs
+        self.sbox_latency = subbytes_latency(impl, **kwargs)
+        self.latency = self.sbox_latency + 1
+
+    def elaborate(self, platform):
+        m = Module()
+
+        m.submodules.sub_bytes = sub_bytes = SubBytes(self.in_state, impl=self.impl, **self.kwargs)
+        m.submodules.sub_word = sub_word = SubBytes(rot_word(self.in_key), impl=self.impl, **self.kwargs)
+        # Everything else waits for the S-boxes.
+        key = delay(m, self.in_key, self.sbox_latency)
+        valid = delay(m, self.in_valid, self.sbox_latency)
+        if self.rnd is None:
+            rnd = delay(m, self.in_round, self.sbox_latency)
+            rcon = Array(Const(c, 8) for c in SimpleAES.rcon[:NROUNDS + 1])[rnd]
+        else:
+            rnd = Const(self.rnd, len(self.in_round))
+            rcon = Const(SimpleAES.rcon[self.rnd], 8)
+
+        shifted = Signal(128, name="shifted")
+        mixed = Signal(128, name="mixed")
+        new_key = Signal(128, name="new_key")
+        m.d.comb += [
+            shifted.eq(shift_rows(sub_bytes.out_state)),
+            new_key.eq(next_key(key, sub_word.out_state, rcon)),
+        ]
+        if self.rnd == NROUNDS:
+            m.d.comb += mixed.eq(shifted)
+        elif self.rnd is None:
+            m.d.comb += mixed.eq(Mux(rnd == NROUNDS, shifted, mix_columns(shifted)))
+        else:
+            m.d.comb += mixed.eq(mix_columns(shifted))
+        m.d.sync += [
+            self.out_state.eq(mixed ^ new_key),
+            self.out_key.eq(new_key),
+            self.out_round.eq(rnd),
+            self.out_valid.eq(valid),
+        ]
+        return m
+
+    def resources(self):
+        return round_resources(self.impl, self.rnd, **self.kwargs)
+
+
+class AES128Core(Elaboratable):
+    # AES-128 encryption with `unroll` round units in a ring: a block enters
+    # with its key, goes through every unit and comes back until all ten
+    # rounds are done, the round keys being expanded alongside. unroll=10
+    # is a pipeline accepting a block every cycle; with fewer units the
+    # returning blocks take priority and in_ready drops, leaving one block
+    # every NROUNDS // unroll cycles on average.
+    def __init__(self, impl="m9k", unroll=NROUNDS, **kwargs):
+        assert NROUNDS % unroll == 0
+        self.impl = impl
+        self.unroll = unroll
+        self.passes = NROUNDS // unroll
+        self.in_block = Signal(128, name="in_block")
+        self.in_key = Signal(128, name="in_key")
+        self.in_valid = Signal(name="in_valid")
+        self.in_ready = Signal(name="in_ready")
+        self.out_block = Signal(128, name="out_block")
+        self.out_valid = Signal(name="out_valid")
+        self.kwargs = kwargs
+        round_latency = subbytes_latency(impl, **kwargs) + 1
+        self.latency = NROUNDS * round_latency
+        self.interval = self.passes
+        # Blocks in flight.
+        self.capacity = unroll * round_latency
+
+    def round_numbers(self):
+        # Fixed per unit in a pipeline, from in_round when looping.
+        return [j + 1 if self.passes == 1 else None for j in range(self.unroll)]
+
+    def elaborate(self, platform):
+        m = Module()
+
+        rounds = [AESRound(self.impl, rnd=rnd, **self.kwargs) for rnd in self.round_numbers()]
+        for j, rnd in enumerate(rounds):
+            m.submodules[f"round{j}"] = rnd
+        first, last = rounds[0], rounds[-1]
+        for prev, rnd in zip(rounds, rounds[1:]):
+            m.d.comb += [
+                rnd.in_state.eq(prev.out_state),
+                rnd.in_key.eq(prev.out_key),
+                rnd.in_round.eq(prev.out_round + 1),
+                rnd.in_valid.eq(prev.out_valid),
+            ]
+
+        done = last.out_round == NROUNDS if self.passes > 1 else C(1)
+        again = last.out_valid & ~done
+        m.d.comb += [
+            self.in_ready.eq(~again),
+            self.out_block.eq(last.out_state),
+            self.out_valid.eq(last.out_valid & done),
+        ]
+        with m.If(again):
+            m.d.comb += [
+                first.in_state.eq(last.out_state),
+                first.in_key.eq(last.out_key),
+                first.in_round.eq(last.out_round + 1),
+                first.in_valid.eq(1),
+            ]
+        with m.Else():
+            m.d.comb += [
+                first.in_state.eq(self.in_block ^ self.in_key),
+                first.in_key.eq(self.in_key),
+                first.in_round.eq(1),
+                first.in_valid.eq(self.in_valid),
+            ]
+        return m
+
+    def resources(self):
+        # Plus the initial AddRoundKey and, when looping, the ring input mux.
+        extra = Resources(128 * (2 if self.passes > 1 else 1), 0, 0, 0, 0, 0)
+        return sum((round_resources(self.impl, rnd, **self.kwargs) for rnd in self.round_numbers()), extra)
+
+    def ports(self):
+        return [self.in_block, self.in_key, self.in_valid, self.in_ready, self.out_block, self.out_valid]
+
+
+class AES128Iterative(Elaboratable):
+    # Low-area AES-128: one byte-wide S-box for both the state and the key
+    # expansion, the state and key held as four 4-byte row shift chains
+    # (row r, column c in byte c of chain r) and no random access to
+    # either. A row shifts towards column 0, its column 3 loading from
+    # the S-box bus or the column datapath. Each round takes
+    #   KEY:  4 cycles, SubWord(RotWord) of key column 3 into the 4-byte
+    #         chain t (finishing latency cycles into SUB0)
+    #   SUBr: r + 4 + latency cycles per row r, the row passing through the
+    #         S-box; its first r shifts bypass it, which is ShiftRows
+    #   MIX:  4 cycles, state and key shifting by a column: column 3 takes
+    #         MixColumns and AddRoundKey of the column 0 taps, and the next
+    #         round key column, computed from the key chain taps
+    # A block is accepted in IDLE; out_valid marks the result there, in the
+    # cycle the next block can be accepted.
+    def __init__(self, impl="m9k", **kwargs):
+        self.impl = impl
+        self.in_block = Signal(128, name="in_block")
+        self.in_key = Signal(128, name="in_key")
+        self.in_valid = Signal(name="in_valid")
+        self.in_ready = Signal(name="in_ready")
+        self.out_block = Signal(128, name="out_block")
+        self.out_valid = Signal(name="out_valid")
+        self.kwargs = kwargs
+        self.sbox_in = Signal(8, name="sbox_in")
+        self.sbox_latency = lat = subbytes_latency(impl, **kwargs)
+        self.phases = {"KEY": 4, **{f"SUB{r}": r + 4 + lat for r in range(4)}, "MIX": 4}
+        self.round_cycles = sum(self.phases.values())
+        self.cycles = 1 + NROUNDS * self.round_cycles
+        self.latency = self.cycles
+        self.interval = self.cycles
+        self.capacity = 1
+
+    def elaborate(self, platform):
+        m = Module()
+
+        m.submodules.sbox = sbox = SubBytes(self.sbox_in, impl=self.impl, **self.kwargs)
+        lat = self.sbox_latency
+        state = [[Signal(8, name=f"s{r}{c}", reset_less=True) for c in range(4)] for r in range(4)]
+        key = [[Signal(8, name=f"k{r}{c}", reset_less=True) for c in range(4)] for r in range(4)]
+        t = [Signal(8, name=f"t{r}", reset_less=True) for r in range(4)]
+        rnd = Signal(range(NROUNDS + 1), name="rnd")
+        count = Signal(range(max(self.phases.values())), name="count")
+        done = Signal(name="done")
+        last = rnd == NROUNDS
+        rcon = Signal(8, name="rcon")
+        m.d.comb += rcon.eq(Array(Const(c, 8) for c in SimpleAES.rcon[:NROUNDS + 1])[rnd])
+
+        # The column datapath, on the column 0 taps: next round key column
+        # (word 0 from t, the others chaining on the column just shifted
+        # into column 3), then MixColumns and AddRoundKey.
+        mixed = Signal(32, name="mixed")
+        m.d.comb += mixed.eq(mix_column(Cat(*(state[r][0] for r in range(4)))))
+        new_key = [Signal(8, name=f"new_key{r}") for r in range(4)]
+        new_col = [Signal(8, name=f"new_col{r}") for r in range(4)]
+        for r in range(4):
+            first = t[r] ^ rcon if r == 0 else t[r]
+            m.d.comb += [
+                new_key[r].eq(key[r][0] ^ Mux(count == 0, first, key[r][3])),
+                new_col[r].eq(Mux(last, state[r][0], state_byte(mixed, r)) ^ new_key[r]),
+            ]
+        sbox_bus = Signal(8, name="sbox_bus")
+        m.d.comb += [
+            sbox_bus.eq(sbox.out_state),
+            self.out_block.eq(Cat(*(state[r][c] for c in range(4) for r in range(4)))),
+            self.out_valid.eq(done),
+        ]
+        m.d.sync += done.eq(0)
+
+        def shift(chain, value):
+            m.d.sync += [chain[c].eq(chain[c + 1]) for c in range(3)]
+            m.d.sync += chain[3].eq(value)
+
+        def next_phase(name, phase):
+            with m.If(count == self.phases[name] - 1):
+                m.d.sync += count.eq(0)
+                m.next = phase
+            with m.Else():
+                m.d.sync += count.eq(count + 1)
+
+        with m.FSM(name="aes"):
+            with m.State("IDLE"):
+                m.d.comb += self.in_ready.eq(1)
+                with m.If(self.in_valid):
+                    for r in range(4):
+                        for c in range(4):
+                            k = state_byte(self.in_key, 4 * c + r)
+                            m.d.sync += [
+                                state[r][c].eq(state_byte(self.in_block, 4 * c + r) ^ k),
+                                key[r][c].eq(k),
+                            ]
+                    m.d.sync += [
+                        rnd.eq(1),
+                        count.eq(0),
+                    ]
+                    m.next = "KEY"
+            with m.State("KEY"):
+                # RotWord: rows 1, 2, 3, 0 of key column 3.
+                with m.Switch(count):
+                    for r in range(4):
+                        with m.Case(r):
+                            m.d.comb += self.sbox_in.eq(key[(r + 1) % 4][3])
+                shift(t, sbox_bus)
+                next_phase("KEY", "SUB0")
+            for r in range(4):
+                with m.State(f"SUB{r}"):
+                    m.d.comb += self.sbox_in.eq(state[r][0])
+                    if r:
+                        with m.If(count < r):
+                            m.d.comb += sbox_bus.eq(self.sbox_in)
+                    elif lat:
+                        # The S-box still delivers the last bytes of t.
+                        with m.If(count < lat):
+                            shift(t, sbox_bus)
+                    shift(state[r], sbox_bus)
+                    next_phase(f"SUB{r}", f"SUB{r + 1}" if r < 3 else "MIX")
+            with m.State("MIX"):
+                for r in range(4):
+                    shift(state[r], new_col[r])
+                    shift(key[r], new_key[r])
+                with m.If(count == self.phases["MIX"] - 1):
+                    m.d.sync += [
+                        count.eq(0),
+                        rnd.eq(rnd + 1),
+                    ]
+                    with m.If(last):
+                        m.d.sync += done.eq(1)
+                        m.next = "IDLE"
+                    with m.Else():
+                        m.next = "KEY"
+                with m.Else():
+                    m.d.sync += count.eq(count + 1)
+        return m
+
+    def resources(self):
+        # Each register bit's next-state function estimated by its fan-in,
+        # holding on the LE clock enable:
+        #   state columns 0-2: shift, or load block ^ key
+        #   state column 3:    S-box bus, column datapath, or load
+        #   key columns 0-2:   shift, or load
+        #   key column 3:      next key column, or load
+        #   t:                 plain byte shift, no LUT
+        # plus the next key column (two taps, t, the first-column select and
+        # rcon for row 0), the column datapath (MixColumns bit j as in
+        # AESRound, plus the last-round bypass and the key), the S-box
+        # input mux (four state rows, four key bytes) and its bypass.
+        funcs = [4] * 96 + [6] * 32 + [3] * 96 + [3] * 32
+        funcs += [5] * 8 + [4] * 24
+        funcs += [2 * ((j > 0) + (j in (0, 1, 3, 4))) + 3 + 3 for j in range(8)] * 4
+        funcs += [8 + 3] * 8 + [3] * 8
+        costs = [_xor_luts(n) for n in funcs]
+        # FSM state, round, phase count and done; rcon from the round.
+        control = Resources(16 + 8, 0, 3 + 4 + len(Signal(range(max(self.phases.values())))) + 1, 0, 0, 0)
+        logic = Resources(sum(c for c, l in costs), 0, 128 + 128 + 32, 0, 0, max(l for c, l in costs))
+        return subbytes_resources(1, self.impl, **self.kwargs) + control + logic
+
+    def ports(self):
+        return [self.in_block, self.in_key, self.in_valid, self.in_ready, self.out_block, self.out_valid]
+
+
+def measure(core, nblocks=None, seed=0, max_cycles=100000):
+    # Offers nblocks random blocks back to back in nmigen.sim and checks
+    # the results against SimpleAES. Returns the sustained cycles per
+    # block, taken over the second half of the blocks: the first half
+    # fills the core, and a multiple of its capacity keeps the window
+    # aligned with the bursts a looping core accepts in.
+    if nblocks is None:
+        nblocks = 4 * max(core.capacity, 1)
+    assert nblocks % 2 == 0
+    rng = np.random.default_rng(seed)
+    blocks = [bytes(rng.integers(0, 256, 16, dtype=np.uint8)) for i in range(nblocks)]
+    keys = [bytes(rng.integers(0, 256, 16, dtype=np.uint8)) for i in range(nblocks)]
+    m = Module()
+    m.domains.sync = ClockDomain("sync")
+    m.submodules.core = core
+    accepted, out = [], []
+    sim = Simulator(m)
+    sim.add_clock(1e-6)
+
+    def process():
+        for t in range(max_cycles):
+            i = len(accepted)
+            yield core.in_valid.eq(i < nblocks)
+            if i < nblocks:
+                yield core.in_block.eq(int.from_bytes(blocks[i], "little"))
+                yield core.in_key.eq(int.from_bytes(keys[i], "little"))
+            yield Settle()
+            if i < nblocks and (yield core.in_ready):
+                accepted.append(t)
+            if (yield core.out_valid):
+                out.append((yield core.out_block).to_bytes(16, "little"))
+                if len(out) == nblocks:
+                    return
+            yield
+
+    sim.add_sync_process(process)
+    sim.run()
+    aes = SimpleAES()
+    assert out == [aes.encrypt_block(b, k) for b, k in zip(blocks, keys)]
+    return (accepted[-1] - accepted[nblocks // 2 - 1]) / (nblocks // 2)
+
+
+if __name__ == "__main__":
+    parser = main_parser(argparse.ArgumentParser())
+    parser.add_argument("--impl", choices=SubBytes.impls, default="m9k")
+    parser.add_argument("--unroll", type=int, default=NROUNDS)
+    parser.add_argument("--iterative", action="store_true")
+    args = parser.parse_args()
+    core = AES128Iterative(args.impl) if args.iterative else AES128Core(args.impl, args.unroll)
+    print(f"latency {core.latency} interval {core.interval}: {core.resources()}")
+    main_runner(parser, args, core, ports=core.ports())
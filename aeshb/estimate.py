@@ -0,0 +1,69 @@
+# nmigen: UnusedElaboratable=no
+import argparse
+import itertools
+
+from nmigen import *
+
+from aeshb.rom import ROM, plan_rom
+from aeshb.sbox import SBoxComposite, SBoxROMLUT, SBoxROMLUTSplit, SBoxROMLUTSplit2x
+from aeshb.simpleaes import SimpleAES
+
+RANK_KEYS = {
+    "les": lambda r: (r.les, r.brams, r.depth),
+    "depth": lambda r: (r.depth, r.les, r.brams),
+    "area-delay": lambda r: ((r.les + 1) * r.depth, r.brams),
+    "brams": lambda r: (r.brams, r.les, r.depth),
+}
+
+
+def estimate(design):
+    return design.resources()
+
+
+def alternatives(init, width=None, max_stages=None):
+    # Yields (description, design) for every generator configuration able
+    # to hold init. Construction is cheap: nothing is elaborated.
+    init = list(init)
+    width = width or max(max(init).bit_length(), 1)
+    splits = {}
+    for split in ("auto", "depth", "width", ("width",)):
+        splits.setdefault(plan_rom(len(init), width, split=split)[2], split)
+    for plan, split in splits.items():
+        top = len(plan) + 1 if max_stages is None else min(len(plan) + 1, max_stages)
+        for stages in range(0, top + 1):
+            rom = ROM(len(init), width, init, split=split, pipeline_stages=stages)
+            yield f"ROM({len(init)}x{width}, splits={'/'.join(plan) or 'leaf'}, stages={stages})", rom
+    for inverse in (False, True):
+        table = SimpleAES.inv_sbox if inverse else SimpleAES.sbox
+        if init == list(table):
+            for cls in (SBoxROMLUT, SBoxROMLUTSplit2x):
+                yield f"{cls.__name__}(inverse={inverse})", cls(Signal(8), inverse=inverse)
+            for n_banks in (2, 4, 8, 16):
+                levels = n_banks.bit_length() - 1
+                top = levels + 1 if max_stages is None else min(levels + 1, max_stages)
+                for stages in range(top + 1):
+                    if (n_banks, stages) != (2, 1):
+                        yield (f"SBoxROMLUTSplit(inverse={inverse}, n_banks={n_banks}, stages={stages})",
+                               SBoxROMLUTSplit(Signal(8), n_banks, stages, inverse=inverse))
+            for n in range(len(SBoxComposite.cut_points) + 1):
+                if max_stages is not None and n > max_stages:
+                    break
+                for cuts in itertools.combinations(SBoxComposite.cut_points, n):
+                    yield (f"SBoxComposite(inverse={inverse}, cuts={'/'.join(cuts) or 'none'})",
+                           SBoxComposite(Signal(8), inverse=inverse, cuts=cuts))
+
+
+def rank(init, width=None, key="les", max_stages=None):
+    keyfn = RANK_KEYS[key] if isinstance(key, str) else key
+    results = [(name, estimate(design)) for name, design in alternatives(init, width, max_stages)]
+    return sorted(results, key=lambda nr: keyfn(nr[1]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--table", choices=["sbox", "inv_sbox"], default="sbox")
+    parser.add_argument("--key", choices=sorted(RANK_KEYS), default="les")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+    for name, res in rank(getattr(SimpleAES, args.table), key=args.key)[:args.top]:
+        print(f"{name:<52} {res}")
@@ -6,7 +6,16 @@ from nmigen.lib.fpga_lut import LUTInput, LUTOutput
 
 from aeshb.utils import int2bitlist
 
+def permute_mask(mask, perm):
+    # Mask of the same function when LUT input k is driven by the signal
+    # that used to drive input perm[k]. mask may be an int or an integer
+    # numpy array of masks.
+    src = [sum(((j >> k) & 1) << p for k, p in enumerate(perm)) for j in range(1 << len(perm))]
+    return sum(((mask >> s) & 1) << j for j, s in enumerate(src))
+
 class LELUT4(Elaboratable):
+    inputs = 4
+
     def __init__(self, d, mask: int):
         self.d = d
         assert 0 <= mask < 2**16
@@ -40,8 +49,9 @@ if __name__ == "__main__":
     d = Signal(4)
     lelut4 = LELUT4(d, mask=0xDEAD)
     mask_orig = 0xDEAD
-    mask_new = 0xBCEB
-    mask_new2 = 0xF6B9
+    mask_new = permute_mask(mask_orig, (1, 0, 3, 2))
+    mask_new2 = permute_mask(mask_orig, (3, 2, 1, 0))
+    print(f"new: {mask_new:#06x} new2: {mask_new2:#06x}")
     for i in range(16):
         d3o, d2o, d1o, d0o = reversed(int2bitlist(i, 4))
         d3n, d2n, d1n, d0n = d2o, d3o, d0o, d1o
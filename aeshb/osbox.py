@@ -6,6 +6,7 @@
 
 from migen import *
 
+from .resources import Resources, m9k_blocks
 from .simpleaes import SimpleAES
 
 class OSBoxROMLUT(Module):
@@ -26,3 +27,6 @@ class OSBoxROMLUT(Module):
 
     def get_memories(self):
         return [(True, self.mem)]
+
+    def resources(self):
+        return Resources(0, 0, 0, m9k_blocks(self.mem.depth, self.mem.width), self.mem.depth * self.mem.width, 0)
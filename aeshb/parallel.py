@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import os
+import time
+
+import numpy as np
+
+from aeshb.simpleaes import SimpleAES
+
+DEFAULT_CHUNK_BLOCKS = 1 << 16
+
+
+def _attach(name, nblocks, width=16):
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray((nblocks, width), dtype=np.uint8, buffer=shm.buf)
+
+
+def _encrypt_shard(pt_name, key_name, key, ct_name, nblocks, key_len, start, stop):
+    pt_shm, pts = _attach(pt_name, nblocks)
+    ct_shm, cts = _attach(ct_name, nblocks)
+    shms = [pt_shm, ct_shm]
+    if key_name is not None:
+        key_shm, keys = _attach(key_name, nblocks, key_len)
+        shms.append(key_shm)
+        key = keys[start:stop]
+        del keys
+    cts[start:stop] = SimpleAES().encblocks(pts[start:stop], key)
+    # Views must be dropped before the mappings can be closed.
+    del pts, cts, key
+    for shm in shms:
+        shm.close()
+    return start, stop
+
+
+def _to_shared(arr):
+    shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    np.ndarray(arr.shape, dtype=np.uint8, buffer=shm.buf)[:] = arr
+    return shm
+
+
+def encrypt_parallel(plaintexts, key, workers=None, chunk_blocks=DEFAULT_CHUNK_BLOCKS):
+    pts = np.ascontiguousarray(plaintexts, dtype=np.uint8).reshape(-1, 16)
+    nblocks = len(pts)
+    per_block_keys = isinstance(key, np.ndarray) and key.ndim == 2
+    if per_block_keys:
+        assert len(key) == nblocks
+    elif isinstance(key, np.ndarray):
+        key = key.tobytes()
+    workers = workers or os.cpu_count()
+    if workers == 1 or nblocks <= chunk_blocks:
+        return SimpleAES().encblocks(pts, key)
+
+    shms = []
+    try:
+        pt_shm = _to_shared(pts)
+        shms.append(pt_shm)
+        ct_shm = shared_memory.SharedMemory(create=True, size=pts.nbytes)
+        shms.append(ct_shm)
+        key_name, key_len = None, len(key)
+        if per_block_keys:
+            key_shm = _to_shared(np.ascontiguousarray(key, dtype=np.uint8))
+            shms.append(key_shm)
+            key_name, key_len, key = key_shm.name, key.shape[1], None
+        bounds = [(i, min(i + chunk_blocks, nblocks)) for i in range(0, nblocks, chunk_blocks)]
+        with ProcessPoolExecutor(max_workers=min(workers, len(bounds))) as ex:
+            futures = [ex.submit(_encrypt_shard, pt_shm.name, key_name, key, ct_shm.name, nblocks, key_len, start, stop)
+                       for start, stop in bounds]
+            for f in futures:
+                f.result()
+        return np.ndarray(pts.shape, dtype=np.uint8, buffer=ct_shm.buf).copy()
+    finally:
+        for shm in shms:
+            shm.close()
+            shm.unlink()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--blocks", type=int, default=1 << 22)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-blocks", type=int, default=DEFAULT_CHUNK_BLOCKS)
+    parser.add_argument("--per-block-keys", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+    pts = rng.integers(0, 256, size=(args.blocks, 16), dtype=np.uint8)
+    if args.per_block_keys:
+        key = rng.integers(0, 256, size=(args.blocks, 16), dtype=np.uint8)
+    else:
+        key = rng.integers(0, 256, size=16, dtype=np.uint8)
+    t0 = time.perf_counter()
+    encrypt_parallel(pts, key, workers=args.workers, chunk_blocks=args.chunk_blocks)
+    print(f"{args.blocks / (time.perf_counter() - t0):.1f} blocks/s")
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+import argparse
+from collections import namedtuple
+import functools
+import itertools
+import time
+
+import numpy as np
+from nmigen import *
+
+from aeshb.le import LELUT4
+from aeshb.rom import ROM, input_mask, leaf_masks, plan_rom
+from aeshb.simpleaes import SimpleAES
+
+# perm[k] is the original address bit wired to ROM address bit k.
+Permutation = namedtuple("Permutation", "perm init luts baseline levels leaf_width leaf_depth masks")
+
+
+def permute_table(init, perm):
+    # Table for a ROM whose address bit k is driven by original address
+    # bit perm[k]: the permuted ROM returns init[a] for original address a.
+    idx = np.arange(len(init))
+    src = np.zeros_like(idx)
+    for k, p in enumerate(perm):
+        src |= ((idx >> k) & 1) << p
+    return [init[i] for i in src]
+
+
+def permuted_addr(addr, perm):
+    return Cat(*(addr[p] for p in perm))
+
+
+def permuted_rom(init, perm, addr=None, width=None, **kwargs):
+    width = width or max(max(init).bit_length(), 1)
+    if addr is None:
+        addr = Signal(len(perm))
+    rom = ROM(len(init), width, permute_table(init, perm), addr=permuted_addr(addr, perm), **kwargs)
+    return addr, rom
+
+
+def table_bits(init, width):
+    nbytes = (width + 7) // 8
+    raw = np.frombuffer(b"".join(n.to_bytes(nbytes, "little") for n in init), dtype=np.uint8)
+    return np.unpackbits(raw.reshape(len(init), nbytes), axis=1, bitorder="little")[:, :width]
+
+
+def subtable_masks(bits, leaf_bits):
+    # Truth tables over leaf_bits (leaf_bits[0] the LSB) of every output bit
+    # for every setting of the other address bits. The set of functions is
+    # the same however the remaining bits are split between mux levels and
+    # packed leaf width, which is what makes the search memoizable.
+    abits = len(bits).bit_length() - 1
+    t = bits.reshape((2,) * abits + (bits.shape[1],))
+    rest = [abits - 1 - b for b in reversed(range(abits)) if b not in leaf_bits]
+    t = t.transpose(rest + [abits] + [abits - 1 - b for b in reversed(leaf_bits)])
+    t = t.reshape(-1, 1 << len(leaf_bits))
+    packed = np.packbits(t, axis=1, bitorder="little").astype(np.uint64)
+    return np.bitwise_or.reduce(packed << (8 * np.arange(packed.shape[1], dtype=np.uint64)), axis=1)
+
+
+def count_luts(masks, inputs=4, share_complements=True):
+    # Vectorized equivalent of len(minimize_leaves(...)[1]).
+    full = (1 << (1 << inputs)) - 1
+    wires = [input_mask(i, inputs) for i in range(inputs)]
+    free = [0, full] + wires + ([full ^ w for w in wires] if share_complements else [])
+    masks = np.unique(masks)
+    masks = masks[~np.isin(masks, np.array(free, dtype=masks.dtype))]
+    if share_complements:
+        masks = np.unique(np.minimum(masks, full ^ masks))
+    return len(masks)
+
+
+def search_permutations(init, width=None, split="auto", leaf=LELUT4, exhaustive=None):
+    # Finds the address-bit ordering that lets minimize_leaves share the
+    # most leaf LUTs. The mux levels of a LUT tree depend only on the table
+    # depth, so they cannot be traded against the ordering. exhaustive
+    # walks every permutation (the default up to 8 address bits); otherwise
+    # only one ordering per choice of leaf bits is tried, which finds the
+    # same optimum.
+    init = list(init)
+    depth = len(init)
+    abits = depth.bit_length() - 1
+    width = width or max(max(init).bit_length(), 1)
+    les, levels, splits = plan_rom(depth, width, leaf.inputs, split)
+    nwidth, nleaf = splits.count("width"), abits - len(splits)
+    bits = table_bits(init, width)
+
+    @functools.lru_cache(maxsize=None)
+    def cost(leaf_bits):
+        return count_luts(subtable_masks(bits, leaf_bits), leaf.inputs, share_complements=levels > 0)
+
+    def candidates():
+        if exhaustive or exhaustive is None and abits <= 8:
+            yield from itertools.permutations(range(abits))
+            return
+        for combo in itertools.combinations(range(abits), nleaf):
+            rest = tuple(b for b in range(abits) if b not in combo)
+            yield rest[:nwidth] + combo + rest[nwidth:]
+
+    identity = tuple(range(abits))
+    baseline = cost(identity[nwidth:nwidth + nleaf])
+    best, best_luts = identity, baseline
+    for perm in candidates():
+        luts = cost(tuple(sorted(perm[nwidth:nwidth + nleaf])))
+        if luts < best_luts:
+            best, best_luts = perm, luts
+    table = permute_table(init, best)
+    leaf_width, leaf_depth, masks = leaf_masks(table, width, splits)
+    return Permutation(best, table, best_luts, baseline, levels, leaf_width, leaf_depth, masks)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--table", choices=["sbox", "inv_sbox", "Te0", "Td0"], default="Te0")
+    parser.add_argument("--heuristic", action="store_true")
+    args = parser.parse_args()
+    init = getattr(SimpleAES, args.table)
+    t0 = time.perf_counter()
+    res = search_permutations(init, exhaustive=not args.heuristic)
+    print(f"{args.table}: perm {res.perm} LUT4s {res.baseline} -> {res.luts}, "
+          f"mux levels {res.levels} ({time.perf_counter() - t0:.3f}s)")
+    for i, leaf in enumerate(res.masks):
+        print(f"leaf{i}: " + " ".join(f"{m:04x}" for m in leaf))
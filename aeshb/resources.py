@@ -0,0 +1,48 @@
+from collections import namedtuple
+
+# MAX10 M9K block aspect ratios as (depth, width).
+M9K_CONFIGS = ((8192, 1), (4096, 2), (2048, 4), (1024, 9), (512, 18), (256, 36))
+
+
+def m9k_blocks(depth, width):
+    return min(-(-depth // d) * -(-width // w) for d, w in M9K_CONFIGS)
+
+
+def comb_depth(levels, registers):
+    # Worst-case LUT levels between registers for a tree whose logic levels
+    # 0..levels are each one LUT deep, registered after the given levels.
+    points = sorted(registers)
+    if not points:
+        return levels + 1
+    segments = [points[0] + 1, levels - points[-1]]
+    segments += [b - a for a, b in zip(points, points[1:])]
+    return max(segments)
+
+
+class Resources(namedtuple("Resources", "luts muxes registers brams bram_bits depth")):
+    # luts: logic LUT4s, muxes: 2:1 mux LEs, registers: flip-flops,
+    # brams: M9K blocks, depth: worst-case LUT levels between registers.
+    __slots__ = ()
+
+    @property
+    def les(self):
+        # A register fed by a LUT packs into the same LE.
+        logic = self.luts + self.muxes
+        return logic + max(0, self.registers - logic)
+
+    def __add__(self, other):
+        return Resources(
+            self.luts + other.luts,
+            self.muxes + other.muxes,
+            self.registers + other.registers,
+            self.brams + other.brams,
+            self.bram_bits + other.bram_bits,
+            max(self.depth, other.depth),
+        )
+
+    def __str__(self):
+        return (f"LEs: {self.les:5} LUT4: {self.luts:5} mux: {self.muxes:5} reg: {self.registers:5} "
+                f"M9K: {self.brams:3} depth: {self.depth}")
+
+
+NO_RESOURCES = Resources(0, 0, 0, 0, 0, 0)
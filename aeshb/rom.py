@@ -1,44 +1,454 @@
 #!/usr/bin/env python3
 
-from math import log2
+from collections import namedtuple
 from collections.abc import Sequence
-import random
-
-from toolz import partition
+import functools
 
+import numpy as np
 from nmigen import *
 from nmigen.cli import main
 
 from aeshb.le import LELUT4
-from aeshb.utils import bitlist2int
+from aeshb.resources import Resources, comb_depth
+from aeshb.utils import bitlist2int, bit_transpose
 from aeshb.simpleaes import SimpleAES
 
 
-def cascade_depthwise(m, addr_l, data_l, addr_h, data_h, pipelined=False):
-    assert len(addr_l) == len(addr_h) and len(data_l) == len(data_h)
-    addr = Signal(len(addr_l) + 1)
-    data = Signal.like(data_l)
-    m.d.comb += [
-        addr_l.eq(addr[:-1]),
-        addr_h.eq(addr[:-1]),
-    ]
-    with m.If(addr[-1]):
-        m.d.comb += data.eq(data_h)
-    with m.Else():
-        m.d.comb += data.eq(data_l)
-
-    if pipelined:
-        data_reg = Signal(len(data), reset_less=True)
-        addr_reg = Signal(len(addr), reset_less=True)
-        m.d.sync += data_reg.eq(data)
-        m.d.sync += addr_reg.eq(addr)
-        data = data_reg
-
-    return addr, data
+def plan_rom(depth, width, leaf_inputs=4, split="auto"):
+    # Returns (les, levels, splits): the LE count and mux levels of the best
+    # tree for a depth x width ROM, and the top-down list of split kinds.
+    # "depth" halves the table on the address MSB and muxes two subtrees,
+    # "width" packs entry pairs into one twice-as-wide subtree and selects
+    # the half with the address LSB. split may be "auto", "depth", "width"
+    # or a sequence giving the kind per level, top-down, with "auto" after.
+    if not isinstance(split, str):
+        split = tuple(split)
+    return _plan_rom(depth, width, leaf_inputs, split)
+
+
+@functools.lru_cache(maxsize=None)
+def _plan_rom(depth, width, leaf_inputs, split):
+    if depth <= 2 ** leaf_inputs:
+        return width, 0, ()
+    if isinstance(split, tuple):
+        kinds = (split[0],) if split else ("depth", "width")
+        child_split = split[1:] if split else "auto"
+    else:
+        kinds = ("depth", "width") if split == "auto" else (split,)
+        child_split = split
+    best = None
+    for kind in kinds:
+        assert kind in ("depth", "width")
+        if kind == "depth":
+            les, levels, splits = _plan_rom(depth // 2, width, leaf_inputs, child_split)
+            cand = (2 * les + width, levels + 1, (kind,) + splits)
+        else:
+            les, levels, splits = _plan_rom(depth // 2, 2 * width, leaf_inputs, child_split)
+            cand = (les + width, levels + 1, (kind,) + splits)
+        if best is None or cand[:2] < best[:2]:
+            best = cand
+    return best
+
+
+@functools.lru_cache(maxsize=None)
+def input_mask(i, inputs=4):
+    # Truth table of the bare input i.
+    return sum(1 << j for j in range(1 << inputs) if (j >> i) & 1)
+
+
+def mask_support(mask, inputs=4):
+    # Inputs the LUT output actually depends on: input i matters iff the
+    # half of the table with i=1 differs from the half with i=0.
+    return tuple(i for i in range(inputs)
+                 if (mask & ~input_mask(i, inputs)) << (1 << i) != mask & input_mask(i, inputs))
+
+
+def leaf_function(mask, inputs=4, share_complements=True):
+    # Reduces one LUT output to (kind, arg, invert): kind "const" (the
+    # value is invert), "wire" (arg is the input index) or "lut" (arg is
+    # (mask, support)). With share_complements a mask and its complement
+    # map to the same LUT and the consumer absorbs the inverter.
+    full = (1 << (1 << inputs)) - 1
+    if mask in (0, full):
+        return "const", None, mask == full
+    support = mask_support(mask, inputs)
+    if len(support) == 1 and mask == input_mask(support[0], inputs):
+        return "wire", support[0], False
+    if not share_complements:
+        return "lut", (mask, support), False
+    if len(support) == 1:
+        return "wire", support[0], True
+    invert = mask > full ^ mask
+    return "lut", (full ^ mask if invert else mask, support), invert
+
+
+@functools.lru_cache(maxsize=1024)
+def minimize_leaves(masks, inputs=4, share_complements=True):
+    # Every leaf of a tree sees the same address bits, so identical
+    # functions are shared across the whole table. Returns (functions,
+    # luts): functions[leaf][bit] as given by leaf_function and luts the
+    # distinct LUT (mask, support) pairs in first-use order.
+    functions = tuple(tuple(leaf_function(mask, inputs, share_complements) for mask in leaf) for leaf in masks)
+    luts = tuple(dict.fromkeys(arg for leaf in functions for kind, arg, invert in leaf if kind == "lut"))
+    return functions, luts
+
+
+def leaf_data(m, leaf, d, functions, name):
+    # Drives one leaf's output bits, instantiating each distinct LUT once:
+    # bits whose functions reduce to the same LUT share it. Unused LUT
+    # inputs are tied low so they need no routing.
+    data = Signal(len(functions))
+    luts = {}
+    for i, (kind, arg, invert) in enumerate(functions):
+        if kind == "const":
+            value = Const(int(invert))
+        elif kind == "wire":
+            value = d[arg]
+        else:
+            if arg not in luts:
+                mask, support = arg
+                lut_d = Cat(*(d[j] if j in support else Const(0) for j in range(leaf.inputs)))
+                lut = leaf(lut_d, mask=mask)
+                lut.combout.name = f"{name}_data{i}"
+                m.submodules[f"{name}_b{i}"] = lut
+                luts[arg] = lut
+            value = luts[arg].combout
+        m.d.comb += data[i].eq(~value if invert and kind != "const" else value)
+    return data
+
+
+def leaf_masks(init, width, splits, leaf_inputs=None):
+    # Width splits pack entry pairs and depth splits take contiguous
+    # halves, so the leaves are consecutive slices of the table after all
+    # packing steps have been applied. Returns (leaf_width, leaf_depth,
+    # masks) with masks[leaf][bit] as given by bit_transpose. With
+    # leaf_inputs, masks of leaves shallower than the LUT are repeated so
+    # they do not depend on the unused inputs.
+    table = list(init)
+    for i in range(splits.count("width")):
+        table = [table[2 * k] | (table[2 * k + 1] << (width << i)) for k in range(len(table) // 2)]
+    leaf_width = width << splits.count("width")
+    leaf_depth = len(table) >> splits.count("depth")
+    masks = bit_transpose(table, leaf_width, leaf_depth)
+    if leaf_inputs is not None and leaf_depth < 2 ** leaf_inputs:
+        rep = sum(1 << (leaf_depth * k) for k in range(2 ** leaf_inputs // leaf_depth))
+        masks = tuple(tuple(mask * rep for mask in leaf) for leaf in masks)
+    return leaf_width, leaf_depth, masks
+
+
+def register_points(levels, stages):
+    # Spread `stages` registers over the levels + 1 logic levels of a tree
+    # (the leaves, then each mux level). Point p registers the output of
+    # logic level p; the last stage always sits at the tree output.
+    assert 0 <= stages <= levels + 1
+    return tuple(((i + 1) * (levels + 1)) // stages - 1 for i in range(stages))
+
+
+def delay(m, value, cycles):
+    for i in range(cycles):
+        value_reg = Signal(len(value), reset_less=True)
+        m.d.sync += value_reg.eq(value)
+        value = value_reg
+    return value
+
+
+@functools.lru_cache(maxsize=256)
+def rom_netlist(functions, splits, registers, width, abits, leaf_inputs):
+    # Bit-level netlist of the tree with structurally identical nodes
+    # merged, so bits that repeat across the table (or across tables
+    # packed side by side) share their LUTs, muxes and registers. Each
+    # node is ("const", value), ("addr", bit), ("not", i), ("lut", mask,
+    # addr_bits), ("mux", sel, lo, hi) or ("reg", i), i being earlier
+    # node indices and addr_bits None for unused LUT inputs. Returns
+    # (nodes, outputs) with outputs[bit] a node index.
+    ids, nodes = {}, []
+
+    def node(*key):
+        if key not in ids:
+            ids[key] = len(nodes)
+            nodes.append(key)
+        return ids[key]
+
+    def reg(i, cycles=1):
+        for c in range(cycles):
+            i = i if nodes[i][0] == "const" else node("reg", i)
+        return i
+
+    nwidth = splits.count("width")
+    leaves = iter(functions)
+
+    def leaf_bit(kind, arg, invert):
+        if kind == "const":
+            return node("const", int(invert))
+        if kind == "wire":
+            i = node("addr", nwidth + arg)
+        else:
+            mask, support = arg
+            i = node("lut", mask, tuple(nwidth + j if j in support else None for j in range(leaf_inputs)))
+        return node("not", i) if invert else i
+
+    def build(lo, hi, width, splits):
+        # Address bits lo..hi-1 are still undecoded at this node.
+        if not splits:
+            return [reg(leaf_bit(*f), 1 if 0 in registers else 0) for f in next(leaves)]
+        if splits[0] == "depth":
+            sel = hi - 1
+            data_l = build(lo, hi - 1, width, splits[1:])
+            data_h = build(lo, hi - 1, width, splits[1:])
+        else:
+            sel = lo
+            data_p = build(lo + 1, hi, 2 * width, splits[1:])
+            data_l, data_h = data_p[:width], data_p[width:]
+        # The select has to line up with the (possibly registered)
+        # subtree data, which went through every register point below
+        # this level. A mux with identical inputs is just a wire.
+        level = len(splits)
+        cycles = sum(1 for p in registers if p < level)
+        data = [l if l == h else node("mux", reg(node("addr", sel), cycles), l, h)
+                for l, h in zip(data_l, data_h)]
+        return [reg(i, 1 if level in registers else 0) for i in data]
+
+    outputs = build(0, abits, width, splits)
+    return tuple(nodes), tuple(outputs)
+
+
+def delay_cycles(values, cycles):
+    # Model of `cycles` reset-less registers (all starting at 0) on a
+    # per-cycle value array (cycles along the first axis).
+    values = np.asarray(values)
+    if cycles == 0:
+        return values
+    return np.concatenate([np.zeros((min(cycles, len(values)),) + values.shape[1:], dtype=values.dtype), values[:-cycles]])
+
+
+def pack_bits(bits):
+    # Per-bit 0/1 arrays to one integer array, LSB first; object dtype
+    # keeps words wider than 64 bits exact.
+    data = np.zeros(len(bits[0]) if bits else 0, dtype=np.uint64 if len(bits) <= 64 else object)
+    for i, b in enumerate(bits):
+        data |= b.astype(data.dtype) << (np.uint64(i) if data.dtype == np.uint64 else i)
+    return data
+
+
+def simulate_leaf(functions, addrs, leaf=LELUT4):
+    # Model of leaf_data for an address sequence.
+    addrs = np.asarray(addrs, dtype=np.int64)
+    d = [(addrs >> j) & 1 for j in range(leaf.inputs)]
+    bits = []
+    for kind, arg, invert in functions:
+        if kind == "const":
+            value = np.zeros(len(addrs), dtype=np.int64)
+        elif kind == "wire":
+            value = d[arg]
+        else:
+            mask, support = arg
+            value = leaf.simulate(*(d[j] if j in support else 0 for j in range(leaf.inputs)), mask=mask)
+        bits.append(value ^ int(invert))
+    return pack_bits(bits)
+
+
+def simulate_netlist(nodes, outputs, addrs, leaf=LELUT4):
+    # Evaluates a rom_netlist for a whole address sequence at once:
+    # addrs[t] is applied in cycle t and the result is the data output in
+    # the same cycle, registers starting at 0 as in nmigen.sim.
+    addrs = np.asarray(addrs, dtype=np.int64)
+    zero = np.zeros(len(addrs), dtype=np.int64)
+    values = []
+    for n in nodes:
+        if n[0] == "const":
+            value = zero + n[1]
+        elif n[0] == "addr":
+            value = (addrs >> n[1]) & 1
+        elif n[0] == "not":
+            value = values[n[1]] ^ 1
+        elif n[0] == "lut":
+            mask, bits = n[1:]
+            value = leaf.simulate(*(zero if b is None else (addrs >> b) & 1 for b in bits), mask=mask)
+        elif n[0] == "mux":
+            value = np.where(values[n[1]] == 1, values[n[3]], values[n[2]])
+        else:
+            value = delay_cycles(values[n[1]], 1)
+        values.append(value)
+    return pack_bits([values[i] for i in outputs])
+
+
+RomPlan = namedtuple("RomPlan", "levels splits registers latency leaf_width leaf_depth masks functions nodes "
+                                 "output_nodes")
+
+
+def rom_plan(depth, width, init, pipelined=False, pipeline_stages=None, leaf=LELUT4, split="auto"):
+    # Everything about a depth x width tree short of instantiating it: the
+    # split plan, register points and the merged netlist. Plain data, so
+    # wrappers such as MultiPortROM can size and model a tree per port
+    # without building the ROM elaboratables up front.
+    _, levels, splits = plan_rom(depth, width, leaf.inputs, split)
+    # pipelined=True registers the leaves and every mux level.
+    if pipeline_stages is None:
+        pipeline_stages = levels + 1 if pipelined else 0
+    registers = register_points(levels, pipeline_stages)
+    leaf_width, leaf_depth, masks = leaf_masks(init, width, splits, leaf.inputs)
+    # A bare leaf has no consumer to absorb an inverter.
+    functions, lut_masks = minimize_leaves(masks, leaf.inputs, share_complements=levels > 0)
+    nodes, output_nodes = rom_netlist(functions, splits, registers, width, depth.bit_length() - 1, leaf.inputs)
+    return RomPlan(levels, splits, registers, pipeline_stages, leaf_width, leaf_depth, masks, functions, nodes,
+                   output_nodes)
+
+
+def plan_resources(plan):
+    def count(kind):
+        return sum(1 for n in plan.nodes if n[0] == kind)
+    return Resources(count("lut"), count("mux"), count("reg"), 0, 0, comb_depth(plan.levels, plan.registers))
+
+
+def pack_tables(inits, widths=None):
+    # Packs tables side by side, table k in bits offsets[k] and up.
+    # Returns (widths, offsets, packed).
+    assert inits and all(len(init) == len(inits[0]) for init in inits)
+    if widths is None:
+        widths = [max(max(init).bit_length(), 1) for init in inits]
+    offsets = [sum(widths[:k]) for k in range(len(widths))]
+    packed = [sum(init[i] << o for init, o in zip(inits, offsets)) for i in range(len(inits[0]))]
+    return tuple(widths), offsets, packed
+
+
+class ROM(Elaboratable):
+    def __init__(self, depth, width, init, addr=None, pipelined=False, pipeline_stages=None, leaf=LELUT4,
+                 split="auto"):
+        assert depth >= 2 and depth & (depth - 1) == 0
+        assert isinstance(init, Sequence) and len(init) == depth
+        assert all(0 <= n < 2 ** width for n in init)
+        self.depth = depth
+        self.width = width
+        self.init = init
+        self.abits = depth.bit_length() - 1
+        if addr is None:
+            addr = Signal(self.abits, name="addr")
+        assert len(addr) >= self.abits
+        self.addr = addr
+        self.data = Signal(width, name="data")
+        self.leaf = leaf
+        self.plan = rom_plan(depth, width, init, pipelined, pipeline_stages, leaf, split)
+        self.levels = self.plan.levels
+        self.splits = self.plan.splits
+        self.registers = self.plan.registers
+        self.latency = self.plan.latency
+        self.pipelined = self.latency > 0
+        self.leaf_width, self.leaf_depth, self.masks = self.plan.leaf_width, self.plan.leaf_depth, self.plan.masks
+        self.functions = self.plan.functions
+        self.nodes, self.output_nodes = self.plan.nodes, self.plan.output_nodes
+        self.nluts = self.count("lut")
+        self.les = self.nluts + self.count("mux")
+
+    def count(self, kind):
+        return sum(1 for n in self.nodes if n[0] == kind)
+
+    def elaborate(self, platform):
+        m = Module()
+        self.luts = {}
+        values = []
+        for k, n in enumerate(self.nodes):
+            if n[0] == "const":
+                value = Const(n[1], 1)
+            elif n[0] == "addr":
+                value = self.addr[n[1]]
+            elif n[0] == "not":
+                value = ~values[n[1]]
+            elif n[0] == "lut":
+                mask, bits = n[1:]
+                # Unused LUT inputs are tied low so they need no routing.
+                d = Cat(*(Const(0) if b is None else self.addr[b] for b in bits))
+                lut = self.leaf(d, mask=mask)
+                lut.combout.name = f"lut{k}"
+                m.submodules[f"lut{k}"] = lut
+                self.luts[n] = lut
+                value = lut.combout
+            elif n[0] == "mux":
+                value = Signal(name=f"mux{k}")
+                m.d.comb += value.eq(Mux(values[n[1]], values[n[3]], values[n[2]]))
+            else:
+                value = Signal(name=f"reg{k}", reset_less=True)
+                m.d.sync += value.eq(values[n[1]])
+            values.append(value)
+        m.d.comb += self.data.eq(Cat(*(values[i] for i in self.output_nodes)))
+        return m
+
+    def resources(self):
+        return plan_resources(self.plan)
+
+    def simulate(self, addrs):
+        return simulate_netlist(self.nodes, self.output_nodes, addrs, self.leaf)
+
+    def ports(self):
+        return [self.addr, self.data]
+
+
+class MultiROM(ROM):
+    # Several tables read at one address, packed side by side into one
+    # tree: the address decode and select registers are shared, and bits
+    # common to several tables (the T-tables are byte rotations of each
+    # other) share their LUTs and muxes too. outputs[k] is table k's data.
+    def __init__(self, inits, widths=None, addr=None, **kwargs):
+        inits = [list(init) for init in inits]
+        widths, offsets, packed = pack_tables(inits, widths)
+        super().__init__(len(packed), sum(widths), packed, addr=addr, **kwargs)
+        self.inits = inits
+        self.widths = widths
+        self.offsets = offsets
+        self.outputs = [self.data[o:o + w] for o, w in zip(offsets, widths)]
+
+    def simulate_outputs(self, addrs):
+        data = self.simulate(addrs)
+        return [(data >> o) & ((1 << w) - 1) for o, w in zip(self.offsets, self.widths)]
+
+
+class MultiPortROM(Elaboratable):
+    # nports independent read ports of the same (multi-)table ROM, e.g. all
+    # 16 state bytes of a round. LUT fabric cannot share logic between
+    # different addresses, but the tree plan, leaf minimization and netlist
+    # are computed once and reused by every port; the per-port MultiROMs
+    # are only built on elaboration. outputs[port][table].
+    def __init__(self, inits, nports, widths=None, addrs=None, **kwargs):
+        self.inits = [list(init) for init in inits]
+        self.nports = nports
+        self.widths, self.offsets, packed = pack_tables(self.inits, widths)
+        self.depth = len(packed)
+        self.width = sum(self.widths)
+        self.abits = self.depth.bit_length() - 1
+        if addrs is None:
+            addrs = [Signal(self.abits, name=f"addr{i}") for i in range(nports)]
+        assert len(addrs) == nports
+        self.addrs = list(addrs)
+        self.data = [Signal(self.width, name=f"data{i}") for i in range(nports)]
+        self.outputs = [[data[o:o + w] for o, w in zip(self.offsets, self.widths)] for data in self.data]
+        self.kwargs = kwargs
+        self.plan = rom_plan(self.depth, self.width, packed, **kwargs)
+        self.leaf = kwargs.get("leaf", LELUT4)
+        self.latency = self.plan.latency
+
+    def elaborate(self, platform):
+        m = Module()
+        for i, (addr, data) in enumerate(zip(self.addrs, self.data)):
+            m.submodules[f"port{i}"] = rom = MultiROM(self.inits, self.widths, addr=addr, **self.kwargs)
+            m.d.comb += data.eq(rom.data)
+        return m
+
+    def resources(self):
+        res = plan_resources(self.plan)
+        return sum([res] * (self.nports - 1), res)
+
+    def simulate(self, addrs):
+        # addrs[port] is the address sequence of that port.
+        assert len(addrs) == self.nports
+        return [simulate_netlist(self.plan.nodes, self.plan.output_nodes, a, self.leaf) for a in addrs]
+
+    def ports(self):
+        return self.addrs + self.data
+
 
 class ROM16x1(Elaboratable):
     depth = 16
     width = 1
+    latency = 0
 
     def __init__(self, addr, init):
         self.addr = addr
@@ -49,15 +459,22 @@ class ROM16x1(Elaboratable):
             init = bitlist2int(init)
         self.init = init
         self.data = Signal()
-        self.lut4 = LELUT4(self.addr, mask=self.init)
-        self.lut4.combout.name = "data"
 
     def elaborate(self, platform):
         m = Module()
+        self.lut4 = LELUT4(self.addr, mask=self.init)
+        self.lut4.combout.name = "data"
         m.submodules.rom16x1_lut4 = self.lut4
         m.d.comb += self.data.eq(self.lut4.combout)
         return m
 
+    def resources(self):
+        return Resources(self.width, 0, 0, 0, 0, 1)
+
+    def simulate(self, addrs):
+        a = np.asarray(addrs, dtype=np.int64)
+        return LELUT4.simulate(a & 1, (a >> 1) & 1, (a >> 2) & 1, (a >> 3) & 1, mask=self.init)
+
     def ports(self):
         return [self.addr, self.data]
 
@@ -65,6 +482,7 @@ class ROM16x1(Elaboratable):
 class ROM16x8(Elaboratable):
     depth = 16
     width = 8
+    latency = 0
 
     def __init__(self, addr, init):
         self.addr = addr
@@ -74,23 +492,20 @@ class ROM16x8(Elaboratable):
             init = bytes(init)
         assert isinstance(init, bytes) and len(init) == self.depth
         self.init = init
-        self.masks = [0] * self.width
-        for i in range(self.width):
-            for j in range(self.depth):
-                self.masks[i] |= ((self.init[j] >> i) & 1) << j
-        self.lut4 = []
-        for i in range(self.width):
-            lut4 = LELUT4(self.addr, mask=self.masks[i])
-            lut4.combout.name = f"data{i}"
-            self.lut4.append(lut4)
+        self.masks = bit_transpose(self.init, self.width, self.depth)[0]
+        (self.functions,), self.lut_masks = minimize_leaves((self.masks,), share_complements=False)
 
     def elaborate(self, platform):
         m = Module()
-        for i, lut4 in enumerate(self.lut4):
-            m.submodules[f"lut4_b{i}"] = lut4
-            m.d.comb += self.data[i].eq(lut4.combout)
+        m.d.comb += self.data.eq(leaf_data(m, LELUT4, self.addr, self.functions, "lut4"))
         return m
 
+    def resources(self):
+        return Resources(len(self.lut_masks), 0, 0, 0, 0, 1)
+
+    def simulate(self, addrs):
+        return simulate_leaf(self.functions, addrs)
+
     def ports(self):
         return [self.addr, self.data]
 
@@ -103,148 +518,55 @@ class ROM16x16(Elaboratable):
         self.addr = addr
         self.data = Signal(self.width)
         self.pipelined = pipelined
+        self.latency = 1 if pipelined else 0
         assert isinstance(init, Sequence) and len(init) == self.depth
         assert all(0 <= n <= 2 ** self.width for n in init)
         self.init = init
-        self.masks = [0] * self.width
-        for i in range(self.width):
-            for j in range(self.depth):
-                self.masks[i] |= ((self.init[j] >> i) & 1) << j
-        self.lut4 = []
-        for i in range(self.width):
-            lut4 = LELUT4(self.addr, mask=self.masks[i])
-            lut4.combout.name = f"data{i}"
-            self.lut4.append(lut4)
+        self.masks = bit_transpose(self.init, self.width, self.depth)[0]
+        (self.functions,), self.lut_masks = minimize_leaves((self.masks,), share_complements=False)
 
     def elaborate(self, platform):
         m = Module()
-        for i, lut4 in enumerate(self.lut4):
-            m.submodules[f"lut4_b{i}"] = lut4
-            combout = lut4.combout
-            if self.pipelined:
-                combout_reg = Signal(reset_less=True)
-                m.d.sync += combout_reg.eq(combout)
-                combout = combout_reg
-            m.d.comb += self.data[i].eq(combout)
+        data = leaf_data(m, LELUT4, self.addr, self.functions, "lut4")
+        m.d.comb += self.data.eq(delay(m, data, self.latency))
         return m
 
+    def resources(self):
+        return Resources(len(self.lut_masks), 0, self.width * self.latency, 0, 0, 1)
+
+    def simulate(self, addrs):
+        return delay_cycles(simulate_leaf(self.functions, addrs), self.latency)
+
     def ports(self):
         return [self.addr, self.data]
 
 
-class ROM32x16(Elaboratable):
+class ROM32x16(ROM):
     depth = 32
     width = 16
 
-    def __init__(self, addr, init, pipelined=False):
-        self.addr = addr
-        self.data = Signal(self.width)
-        self.pipelined = pipelined
-        assert isinstance(init, Sequence) and len(init) == self.depth
-        assert all(0 <= n <= 2 ** self.width for n in init)
-        self.init = init
-        self.rom_addr = Signal(int(log2(ROM16x16.width)))
-        self.rom_inits = list(partition(ROM16x16.depth, init))
-        self.roms = []
-        for i in range(self.depth // ROM16x16.depth):
-            rom = ROM16x16(self.rom_addr, init=self.rom_inits[i], pipelined=pipelined)
-            self.roms.append(rom)
-
-    def elaborate(self, platform):
-        m = Module()
-        for i, rom in enumerate(self.roms):
-            m.submodules[f"rom32x16_subrom16x16_{i}"] = rom
-        m.d.comb += self.rom_addr.eq(self.addr[:len(self.rom_addr)])
-
-        self.addr_data_32 = []
-        for rom_l, rom_h in partition(2, self.roms):
-            addr_32, data_32 = cascade_depthwise(m, rom_l.addr, rom_l.data, rom_h.addr, rom_h.data, pipelined=self.pipelined)
-            self.addr_data_32.append((addr_32, data_32))
-
-        m.d.comb += self.addr_data_32[0][0].eq(self.addr)
-        m.d.comb += self.data.eq(self.addr_data_32[0][1])
-
-        return m
-
-    def ports(self):
-        return [self.addr, self.data]
+    def __init__(self, addr, init, pipelined=False, pipeline_stages=None):
+        super().__init__(self.depth, self.width, init, addr=addr, pipelined=pipelined,
+                         pipeline_stages=pipeline_stages, split="depth")
 
 
-class ROM128x16(Elaboratable):
+class ROM128x16(ROM):
     depth = 128
     width = 16
 
-    def __init__(self, addr, init, pipelined=False):
-        self.addr = addr
-        self.data = Signal(self.width)
-        self.pipelined = pipelined
-        assert isinstance(init, Sequence) and len(init) == self.depth
-        assert all(0 <= n <= 2 ** self.width for n in init)
-        self.init = init
-        self.rom_addr = Signal(int(log2(ROM16x16.width)))
-        self.rom_inits = list(partition(ROM16x16.depth, init))
-        self.roms = []
-        for i in range(self.depth // ROM16x16.depth):
-            rom = ROM16x16(self.rom_addr, init=self.rom_inits[i], pipelined=pipelined)
-            self.roms.append(rom)
-
-    def elaborate(self, platform):
-        m = Module()
-        for i, rom in enumerate(self.roms):
-            m.submodules[f"rom128x16_subrom16x16_{i}"] = rom
-        m.d.comb += self.rom_addr.eq(self.addr[:len(self.rom_addr)])
-
-        self.addr_data_32 = []
-        for rom_l, rom_h in partition(2, self.roms):
-            addr_32, data_32 = cascade_depthwise(m, rom_l.addr, rom_l.data, rom_h.addr, rom_h.data, pipelined=self.pipelined)
-            self.addr_data_32.append((addr_32, data_32))
+    def __init__(self, addr, init, pipelined=False, pipeline_stages=None):
+        super().__init__(self.depth, self.width, init, addr=addr, pipelined=pipelined,
+                         pipeline_stages=pipeline_stages, split="depth")
 
-        self.addr_data_64 = []
-        for rom_l, rom_h in partition(2, self.addr_data_32):
-            addr_64, data_64 = cascade_depthwise(m, rom_l[0], rom_l[1], rom_h[0], rom_h[1], pipelined=self.pipelined)
-            self.addr_data_64.append((addr_64, data_64))
 
-        self.addr_data_128 = []
-        for rom_l, rom_h in partition(2, self.addr_data_64):
-            addr_128, data_128 = cascade_depthwise(m, rom_l[0], rom_l[1], rom_h[0], rom_h[1], pipelined=self.pipelined)
-            self.addr_data_128.append((addr_128, data_128))
-
-        m.d.comb += self.addr_data_128[0][0].eq(self.addr)
-        m.d.comb += self.data.eq(self.addr_data_128[0][1])
-
-        return m
-
-    def ports(self):
-        return [self.addr, self.data]
-
-
-class ROM256x8(Elaboratable):
+class ROM256x8(ROM):
     depth = 256
     width = 8
 
-    def __init__(self, addr, init, pipelined=False):
-        self.addr = addr
-        self.data = Signal(self.width)
-        self.pipelined = pipelined
-        assert isinstance(init, Sequence) and len(init) == self.depth
-        assert all(0 <= n <= 2 ** self.width for n in init)
-        self.init = init
-        self.rom_addr = Signal(self.width-1)
-        self.rom_init = [(x[1] << 8) | x[0] for x in partition(2, init)]
-        self.rom = ROM128x16(self.rom_addr, init=self.rom_init, pipelined=pipelined)
-
-    def elaborate(self, platform):
-        m = Module()
-        m.submodules.rom128x16 = self.rom
-        m.d.comb += self.rom_addr.eq(self.addr[1:])
-        with m.If(self.addr[0]):
-            m.d.comb += self.data.eq(self.rom.data[self.width:])
-        with m.Else():
-            m.d.comb += self.data.eq(self.rom.data[:self.width])
-        return m
-
-    def ports(self):
-        return [self.addr, self.data]
+    def __init__(self, addr, init, pipelined=False, pipeline_stages=None):
+        # Entry pairs packed into a 128x16 tree, byte selected by addr[0].
+        super().__init__(self.depth, self.width, init, addr=addr, pipelined=pipelined,
+                         pipeline_stages=pipeline_stages, split=("width", "depth", "depth", "depth"))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,94 @@
+# nmigen: UnusedElaboratable=no
+import argparse
+import contextlib
+import random
+import time
+
+import numpy as np
+from nmigen import *
+from nmigen.sim import Simulator, Settle
+
+from aeshb.rom import ROM, MultiPortROM, delay_cycles, plan_rom
+
+
+def sim_outputs(rom, addrs, trace=None):
+    # Runs nmigen.sim with addrs[port][t] applied in cycle t and returns the
+    # data seen in each cycle, per port. trace(sim) may return a context
+    # manager to run the simulation in, e.g. sim.write_vcd(...).
+    multi = isinstance(rom, MultiPortROM)
+    addr_sigs = rom.addrs if multi else [rom.addr]
+    data_sigs = rom.data if multi else [rom.data]
+    m = Module()
+    m.domains.sync = ClockDomain("sync")
+    m.submodules.rom = rom
+    out = [[] for s in data_sigs]
+
+    sim = Simulator(m)
+    sim.add_clock(1e-6)
+
+    def process():
+        for t in range(len(addrs[0])):
+            for sig, a in zip(addr_sigs, addrs):
+                yield sig.eq(int(a[t]))
+            yield Settle()
+            for o, sig in zip(out, data_sigs):
+                o.append((yield sig))
+            yield
+
+    sim.add_sync_process(process)
+    with trace(sim) if trace else contextlib.nullcontext():
+        sim.run()
+    return out
+
+
+def check_equivalence(rom, samples=64, seed=0, addrs=None, trace=None):
+    # Compares the NumPy model against nmigen.sim on a sampled address
+    # sequence. Returns the mismatches as (port, cycle, model, sim). The
+    # first `latency` cycles show whatever the registers held before the
+    # sequence started, so they are not compared.
+    multi = isinstance(rom, MultiPortROM)
+    if addrs is None:
+        rng = np.random.default_rng(seed)
+        addrs = [rng.integers(0, rom.depth, samples) for a in (rom.addrs if multi else [rom.addr])]
+    model = rom.simulate(addrs) if multi else [rom.simulate(addrs[0])]
+    sim = sim_outputs(rom, addrs, trace)
+    return [(p, t, int(m[t]), s[t]) for p, (m, s) in enumerate(zip(model, sim))
+            for t in range(rom.latency, len(s)) if int(m[t]) != s[t]]
+
+
+def rom_table(rom):
+    # ROM16x1 takes its table as a LUT mask and ROM16x8 as bytes.
+    if isinstance(rom.init, int):
+        return [(rom.init >> i) & 1 for i in range(rom.depth)]
+    return list(rom.init)
+
+
+def check_model(rom, addrs):
+    # Model against the table itself, for sweeping many tables quickly.
+    # As in check_equivalence the warm-up cycles are not compared.
+    expected = delay_cycles(np.asarray(rom_table(rom), dtype=object)[addrs], rom.latency)
+    return np.array_equal(rom.simulate(addrs).astype(object)[rom.latency:], expected[rom.latency:])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tables", type=int, default=1000)
+    parser.add_argument("--depth", type=int, default=256)
+    parser.add_argument("--width", type=int, default=8)
+    parser.add_argument("--samples", type=int, default=64)
+    parser.add_argument("--sim-every", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    addrs = np.arange(args.depth)
+    levels = plan_rom(args.depth, args.width)[1]
+    nsim = 0
+    t0 = time.perf_counter()
+    for i in range(args.tables):
+        init = [rng.randrange(2 ** args.width) for j in range(args.depth)]
+        rom = ROM(args.depth, args.width, init, pipeline_stages=rng.randrange(levels + 2))
+        assert check_model(rom, addrs), f"table {i}: model mismatch"
+        if i % args.sim_every == 0:
+            assert not check_equivalence(rom, args.samples, seed=i), f"table {i}: model differs from sim"
+            nsim += 1
+    print(f"{args.tables} tables ({nsim} simulated) in {time.perf_counter() - t0:.2f}s")
@@ -1,16 +1,28 @@
 #!/usr/bin/env python3
 
+import functools
+import operator
+
+import numpy as np
 from nmigen import *
 from nmigen.cli import main
 
+from aeshb import composite
+from aeshb.le import LELUT4
+from aeshb.resources import Resources, m9k_blocks
+from aeshb.rom import MultiPortROM, delay, delay_cycles, plan_resources, register_points, rom_plan, simulate_netlist
 from aeshb.simpleaes import SimpleAES
 
 class SBoxROMLUT(Elaboratable):
-    def __init__(self, in_byte: Signal):
+    # The read port registers the address.
+    latency = 1
+
+    def __init__(self, in_byte: Signal, inverse=False):
         assert len(in_byte) == 8
         self.in_byte = in_byte
         self.out_byte = Signal(8)
-        self.mem = Memory(width=8, depth=len(SimpleAES.sbox), init=SimpleAES.sbox)
+        self.table = SimpleAES.inv_sbox if inverse else SimpleAES.sbox
+        self.mem = Memory(width=8, depth=len(self.table), init=self.table)
 
     def elaborate(self, platform):
         m = Module()
@@ -22,37 +34,306 @@ class SBoxROMLUT(Elaboratable):
         ]
         return m
 
-class SBoxROMLUTSplit2x(Elaboratable):
-    def __init__(self, in_byte: Signal):
+    def resources(self):
+        # The synchronous read port registers the address inside the M9K.
+        return Resources(0, 0, 0, m9k_blocks(self.mem.depth, self.mem.width), self.mem.depth * self.mem.width, 0)
+
+class SBoxROMLUTSplit(Elaboratable):
+    # The table split over n_banks memories addressed by the low address
+    # bits, then a balanced tree of 2:1 muxes selecting by the high bits.
+    # register_stages registers go on the bank outputs and mux levels,
+    # bank outputs first: the M9K clock-to-output is the slowest path.
+    def __init__(self, in_byte: Signal, n_banks=2, register_stages=1, inverse=False):
         assert len(in_byte) == 8
+        assert n_banks in (2, 4, 8, 16)
         self.in_byte = in_byte
         self.out_byte = Signal(8)
-        self.mem_l = Memory(width=8, depth=128, init=SimpleAES.sbox[:128])
-        self.mem_h = Memory(width=8, depth=128, init=SimpleAES.sbox[128:])
+        self.table = SimpleAES.inv_sbox if inverse else SimpleAES.sbox
+        self.n_banks = n_banks
+        self.levels = n_banks.bit_length() - 1
+        self.registers = tuple(self.levels - p for p in reversed(register_points(self.levels, register_stages)))
+        # One cycle for the synchronous read port.
+        self.latency = 1 + register_stages
+        depth = len(self.table) // n_banks
+        self.mems = [Memory(width=8, depth=depth, init=self.table[i * depth:(i + 1) * depth]) for i in range(n_banks)]
 
     def elaborate(self, platform):
         m = Module()
 
-        m.submodules.rd_l_port = rd_l_port = self.mem_l.read_port()
-        m.submodules.rd_h_port = rd_h_port = self.mem_h.read_port()
-        bank_sel_reg = Signal(reset_less=True)
-        rd_l_reg = Signal(8, reset_less=True)
-        rd_h_reg = Signal(8, reset_less=True)
-        m.d.sync += [
-            bank_sel_reg.eq(self.in_byte[-1]),
-            rd_l_reg.eq(rd_l_port.data),
-            rd_h_reg.eq(rd_h_port.data),
-        ]
+        abits = 8 - self.levels
+        data = []
+        for i, mem in enumerate(self.mems):
+            m.submodules[f"rd_port{i}"] = rd_port = mem.read_port()
+            m.d.comb += rd_port.addr.eq(self.in_byte[:abits])
+            data.append(rd_port.data)
+        # The bank select follows the address through the read port.
+        sel = delay(m, self.in_byte[abits:], 1)
+        for level in range(self.levels + 1):
+            if level:
+                data = [Mux(sel[0], hi, lo) for lo, hi in zip(data[0::2], data[1::2])]
+                sel = sel[1:]
+            if level in self.registers:
+                data = [delay(m, d, 1) for d in data]
+                sel = delay(m, sel, 1) if len(sel) else sel
+        m.d.comb += self.out_byte.eq(data[0])
+        return m
+
+    def simulate(self, values):
+        # Cycle-accurate model, registers (and read ports) starting at 0.
+        values = np.asarray(values, dtype=np.int64)
+        abits = 8 - self.levels
+        table = np.array(self.table).reshape(self.n_banks, -1)
+        data = [delay_cycles(bank[values & ((1 << abits) - 1)], 1) for bank in table]
+        sel = delay_cycles(values >> abits, 1)
+        for level in range(self.levels + 1):
+            if level:
+                data = [np.where(sel & 1, hi, lo) for lo, hi in zip(data[0::2], data[1::2])]
+                sel = sel >> 1
+            if level in self.registers:
+                data = [delay_cycles(d, 1) for d in data]
+                sel = delay_cycles(sel, 1)
+        return data[0]
+
+    def resources(self):
+        registers = self.levels + sum(8 * (self.n_banks >> p) + self.levels - p for p in self.registers)
+        bounds = (0,) + self.registers
+        depth = max(b - a for a, b in zip(bounds, self.registers + (self.levels,)))
+        return Resources(0, 8 * (self.n_banks - 1), registers, sum(m9k_blocks(m.depth, m.width) for m in self.mems),
+                         sum(m.depth * m.width for m in self.mems), depth)
+
+    def ports(self):
+        return [self.in_byte, self.out_byte]
+
+class SBoxROMLUTSplit2x(SBoxROMLUTSplit):
+    def __init__(self, in_byte: Signal, inverse=False):
+        super().__init__(in_byte, n_banks=2, register_stages=1, inverse=inverse)
+
+COMPOSITE_CUTS = ("map", "delta", "inv", "mul", "out")
+
+
+def composite_cuts(pipelined=False, cuts=None):
+    # The cut points of an SBoxComposite in datapath order.
+    if cuts is None:
+        cuts = COMPOSITE_CUTS if pipelined else ()
+    assert all(c in COMPOSITE_CUTS for c in cuts)
+    return tuple(c for c in COMPOSITE_CUTS if c in cuts)
+
+
+def composite_blocks(inverse=False):
+    # (name, table, input bits) per block.
+    return (
+        ("map", composite.INV_MAP if inverse else composite.MAP, 8),
+        ("delta", composite.DELTA, 8),
+        ("inv", composite.INV, 4),
+        ("mul", composite.MUL, 12),
+        ("out", composite.INV_OUT if inverse else composite.OUT, 8),
+    )
+
+
+def simulate_composite(blocks, cuts, values):
+    # Cycle-accurate model, as ROM.simulate.
+    (_, t_map, _), (_, t_delta, _), (_, t_inv, _), (_, t_mul, _), (_, t_out, _) = blocks
+    cut = lambda name, v: delay_cycles(v, 1 if name in cuts else 0)
+    mapped = cut("map", np.array(t_map)[np.asarray(values, dtype=np.int64)])
+    al, ah, s = mapped & 15, (mapped >> 4) & 15, mapped >> 8
+    d = cut("delta", np.array(t_delta)[ah << 4 | al] | ah << 4 | s << 8)
+    dinv = cut("inv", np.array(t_inv)[d & 15] | (d & ~15))
+    c = cut("mul", np.array(t_mul)[(dinv & 15) << 8 | (dinv >> 8) << 4 | (dinv >> 4) & 15])
+    return cut("out", np.array(t_out)[c])
+
+
+def composite_resources(blocks, cuts):
+    # LUT4s from the ANF packing estimate; registers are everything live
+    # at each cut, depth the LUT levels between cuts.
+    live = {"map": 12, "delta": 12, "inv": 12, "mul": 8, "out": 8}
+    luts, depth, segment = 0, 0, 0
+    for name, table, nin in blocks:
+        if nin == LELUT4.inputs:
+            costs = [(1, 1)] * max(table).bit_length()
+        else:
+            costs = [composite.lut4_cost(monos) for monos in composite.anf(table, nin)]
+        luts += sum(c for c, l in costs)
+        segment += max(l for c, l in costs)
+        if name in cuts:
+            depth, segment = max(depth, segment), 0
+    depth = max(depth, segment)
+    return Resources(luts, 0, sum(live[c] for c in cuts), 0, 0, depth)
+
+
+# SubBytes' latency and resources from its parameters alone, for the
+# units that build it on elaboration.
+def subbytes_latency(impl="m9k", inverse=False, **kwargs):
+    if impl == "m9k":
+        assert not kwargs
+        return 1
+    if impl == "rom":
+        return rom_plan(256, 8, SimpleAES.inv_sbox if inverse else SimpleAES.sbox, **kwargs).latency
+    return len(composite_cuts(**kwargs))
+
+
+def subbytes_resources(nbytes, impl="m9k", inverse=False, **kwargs):
+    if impl == "m9k":
+        assert not kwargs
+        # Two bytes per block RAM, one on each port.
+        nmems = (nbytes + 1) // 2
+        return Resources(0, 0, 1, nmems * m9k_blocks(256, 8), nmems * 256 * 8, 0)
+    if impl == "rom":
+        plan = rom_plan(256, 8, SimpleAES.inv_sbox if inverse else SimpleAES.sbox, **kwargs)
+        latency, per_byte = plan.latency, plan_resources(plan)
+    else:
+        cuts = composite_cuts(**kwargs)
+        latency, per_byte = len(cuts), composite_resources(composite_blocks(inverse), cuts)
+    return sum([per_byte] * nbytes, Resources(0, 0, latency, 0, 0, 0))
+
+
+class SBoxComposite(Elaboratable):
+    # S-box computed in GF((2^4)^2) (see aeshb.composite) instead of read
+    # from a table. Each entry of cuts registers everything live after
+    # that block, in datapath order; the GF(2^4) inversion is one LUT4 per
+    # bit and the other blocks are XOR-of-AND networks from their ANF.
+    cut_points = COMPOSITE_CUTS
+
+    def __init__(self, in_byte: Signal, inverse=False, pipelined=False, cuts=None):
+        assert len(in_byte) == 8
+        self.in_byte = in_byte
+        self.out_byte = Signal(8)
+        self.inverse = inverse
+        self.table = SimpleAES.inv_sbox if inverse else SimpleAES.sbox
+        self.cuts = composite_cuts(pipelined, cuts)
+        self.latency = len(self.cuts)
+        self.pipelined = self.latency > 0
+        self.blocks = composite_blocks(inverse)
+
+    @staticmethod
+    def anf_logic(d, monomials):
+        terms = [functools.reduce(operator.and_, (d[i] for i in range(len(d)) if (mono >> i) & 1), Const(1))
+                 for mono in sorted(monomials)]
+        return functools.reduce(operator.xor, terms, Const(0))
+
+    def block(self, m, name, table, nin, d):
+        # A signal per block: chaining the expressions directly makes
+        # nmigen's transforms walk them exponentially.
+        out = Signal(max(table).bit_length(), name=name)
+        if nin == LELUT4.inputs:
+            for b in range(len(out)):
+                mask = sum(((table[j] >> b) & 1) << j for j in range(16))
+                m.submodules[f"{name}_lut{b}"] = lut = LELUT4(d, mask=mask)
+                m.d.comb += out[b].eq(lut.combout)
+        else:
+            m.d.comb += out.eq(Cat(*(self.anf_logic(d, monos) for monos in composite.anf(table, nin))))
+        return out
+
+    def elaborate(self, platform):
+        m = Module()
+
+        def cut(name, value):
+            return delay(m, value, 1 if name in self.cuts else 0)
+
+        (_, t_map, _), (_, t_delta, _), (_, t_inv, _), (_, t_mul, _), (_, t_out, _) = self.blocks
+        mapped = cut("map", self.block(m, "map", t_map, 8, self.in_byte))
+        al, ah, s = mapped[:4], mapped[4:8], mapped[8:]
+        d = cut("delta", Cat(self.block(m, "delta", t_delta, 8, Cat(al, ah)), ah, s))
+        dinv = cut("inv", Cat(self.block(m, "inv", t_inv, 4, d[:4]), d[4:]))
+        c = cut("mul", self.block(m, "mul", t_mul, 12, Cat(dinv[4:8], dinv[8:], dinv[:4])))
+        m.d.comb += self.out_byte.eq(cut("out", self.block(m, "out", t_out, 8, c)))
+        return m
+
+    def simulate(self, values):
+        return simulate_composite(self.blocks, self.cuts, values)
+
+    def resources(self):
+        return composite_resources(self.blocks, self.cuts)
+
+    def ports(self):
+        return [self.in_byte, self.out_byte]
+
+class SubBytes(Elaboratable):
+    # SubBytes on every byte of in_state, byte i being in_state[8 * i:8 * i
+    # + 8], with one of the S-box implementations per byte:
+    #   "m9k":       block RAMs, each read by two bytes through the two
+    #                ports of the M9K (latency 1)
+    #   "rom":       LUT-tree ROMs (MultiPortROM; kwargs as for ROM)
+    #   "composite": SBoxComposite (kwargs pipelined or cuts)
+    # Fixed latency: out_valid is in_valid delayed with the data. Only
+    # the plain parameters are kept up front; the per-byte S-boxes are
+    # built on elaboration.
+    impls = ("m9k", "rom", "composite")
+
+    def __init__(self, in_state: Signal, inverse=False, impl="m9k", **kwargs):
+        assert impl in self.impls
+        assert len(in_state) % 8 == 0
+        self.in_state = in_state
+        self.nbytes = len(in_state) // 8
+        self.out_state = Signal(len(in_state), name="out_state")
+        self.in_valid = Signal(name="in_valid")
+        self.out_valid = Signal(name="out_valid")
+        self.inverse = inverse
+        self.impl = impl
+        self.table = SimpleAES.inv_sbox if inverse else SimpleAES.sbox
+        self.kwargs = kwargs
+        if impl == "m9k":
+            assert not kwargs
+            self.mems = [Memory(width=8, depth=len(self.table), init=self.table) for i in range((self.nbytes + 1) // 2)]
+            self.latency = 1
+        elif impl == "rom":
+            self.plan = rom_plan(len(self.table), 8, self.table, **kwargs)
+            self.latency = self.plan.latency
+        else:
+            self.cuts = composite_cuts(**kwargs)
+            self.blocks = composite_blocks(inverse)
+            self.latency = len(self.cuts)
+
+    def in_bytes(self):
+        return [self.in_state[8 * i:8 * i + 8] for i in range(self.nbytes)]
+
+    def elaborate(self, platform):
+        m = Module()
+
+        if self.impl == "m9k":
+            out_bytes = []
+            for i in range(self.nbytes):
+                m.submodules[f"rd_port{i}"] = rd_port = self.mems[i // 2].read_port()
+                m.d.comb += rd_port.addr.eq(self.in_state[8 * i:8 * i + 8])
+                out_bytes.append(rd_port.data)
+        elif self.impl == "rom":
+            m.submodules.rom = rom = MultiPortROM([self.table], self.nbytes, addrs=self.in_bytes(), **self.kwargs)
+            out_bytes = rom.data
+        else:
+            out_bytes = []
+            for i, in_byte in enumerate(self.in_bytes()):
+                m.submodules[f"sbox{i}"] = sbox = SBoxComposite(in_byte, inverse=self.inverse, **self.kwargs)
+                out_bytes.append(sbox.out_byte)
         m.d.comb += [
-            rd_l_port.addr.eq(self.in_byte[:-1]),
-            rd_h_port.addr.eq(self.in_byte[:-1]),
+            self.out_state.eq(Cat(*out_bytes)),
+            self.out_valid.eq(delay(m, self.in_valid, self.latency)),
         ]
-        with m.If(bank_sel_reg):
-            m.d.comb += self.out_byte.eq(rd_h_reg)
-        with m.Else():
-            m.d.comb += self.out_byte.eq(rd_l_reg)
         return m
 
+    def simulate(self, states):
+        # states[t] is the input bytes in cycle t; cycle-accurate for the
+        # LUT implementations, block RAM outputs starting at 0.
+        states = np.asarray(states, dtype=np.int64)
+        if self.impl == "rom":
+            leaf = self.kwargs.get("leaf", LELUT4)
+            return np.stack([simulate_netlist(self.plan.nodes, self.plan.output_nodes, states[:, i], leaf)
+                             for i in range(self.nbytes)], axis=1)
+        if self.impl == "composite":
+            return simulate_composite(self.blocks, self.cuts, states)
+        return delay_cycles(np.array(self.table)[states], self.latency)
+
+    def resources(self):
+        return subbytes_resources(self.nbytes, self.impl, self.inverse, **self.kwargs)
+
+    def ports(self):
+        return [self.in_state, self.in_valid, self.out_state, self.out_valid]
+
+class SubBytes128(SubBytes):
+    def __init__(self, in_state=None, inverse=False, impl="m9k", **kwargs):
+        if in_state is None:
+            in_state = Signal(128, name="in_state")
+        assert len(in_state) == 128
+        super().__init__(in_state, inverse=inverse, impl=impl, **kwargs)
+
 if __name__ == "__main__":
     in_byte = Signal(8)
     sbox = SBoxROMLUTSplit2x(in_byte)
@@ -1,4 +1,46 @@
 import copy
+import functools
+import struct
+
+import numpy as np
+
+
+def _gmul(a, b):
+    p = 0
+    while b:
+        if b & 1:
+            p ^= a
+        a = ((a << 1) ^ (0x1b if a & 0x80 else 0)) & 0xff
+        b >>= 1
+    return p
+
+
+mul2 = tuple(_gmul(x, 2) for x in range(256))
+mul3 = tuple(_gmul(x, 3) for x in range(256))
+mul9 = tuple(_gmul(x, 9) for x in range(256))
+mul11 = tuple(_gmul(x, 11) for x in range(256))
+mul13 = tuple(_gmul(x, 13) for x in range(256))
+mul14 = tuple(_gmul(x, 14) for x in range(256))
+
+
+def _inverse(sbox):
+    inv = [None] * len(sbox)
+    for i, s in enumerate(sbox):
+        inv[s] = i
+    return tuple(inv)
+
+
+def _ttable(sbox, coeffs, rot):
+    # T[x] = (c0*S[x], c1*S[x], c2*S[x], c3*S[x]) as a big-endian column
+    # word, rotated right by rot bits for T1..T3. Encryption uses the
+    # MixColumns coefficients (2, 1, 1, 3), decryption (14, 9, 13, 11).
+    t = []
+    for s in sbox:
+        w = 0
+        for c in coeffs:
+            w = (w << 8) | _gmul(s, c)
+        t.append(((w >> rot) | (w << (32 - rot))) & 0xffffffff)
+    return tuple(t)
 
 
 class SimpleAES:
@@ -72,6 +114,24 @@ class SimpleAES:
         0xcc, 0x83, 0x1d, 0x3a, 0x74, 0xe8, 0xcb
     )
 
+    inv_sbox = _inverse(sbox)
+
+    Te0 = _ttable(sbox, (2, 1, 1, 3), 0)
+    Te1 = _ttable(sbox, (2, 1, 1, 3), 8)
+    Te2 = _ttable(sbox, (2, 1, 1, 3), 16)
+    Te3 = _ttable(sbox, (2, 1, 1, 3), 24)
+
+    Td0 = _ttable(inv_sbox, (14, 9, 13, 11), 0)
+    Td1 = _ttable(inv_sbox, (14, 9, 13, 11), 8)
+    Td2 = _ttable(inv_sbox, (14, 9, 13, 11), 16)
+    Td3 = _ttable(inv_sbox, (14, 9, 13, 11), 24)
+
+    backends = ("reference", "ttable")
+
+    def __init__(self, backend="reference"):
+        assert backend in self.backends
+        self.backend = backend
+
     def hex_to_packed(self, hex):
         p = ""
 
@@ -173,6 +233,56 @@ class SimpleAES:
                 block[j][i] = r[j]
         return block
 
+    def invsubbytes(self, block):
+        return [[self.inv_sbox[b] for b in r] for r in block]
+
+    def invshiftrows(self, block):
+        block = copy.deepcopy(block)
+        for i in range(1, 4):
+            block[i] = [block[i][c] for c in range(-i, 4 - i)]
+        return block
+
+    def invmixmul(self, r):
+        a = list(r)
+        return [
+            mul14[a[0]] ^ mul11[a[1]] ^ mul13[a[2]] ^ mul9[a[3]],
+            mul14[a[1]] ^ mul11[a[2]] ^ mul13[a[3]] ^ mul9[a[0]],
+            mul14[a[2]] ^ mul11[a[3]] ^ mul13[a[0]] ^ mul9[a[1]],
+            mul14[a[3]] ^ mul11[a[0]] ^ mul13[a[1]] ^ mul9[a[2]],
+        ]
+
+    def mixcolword(self, w):
+        a0, a1, a2, a3 = w >> 24, (w >> 16) & 0xff, (w >> 8) & 0xff, w & 0xff
+        return (
+            ((mul2[a0] ^ mul3[a1] ^ a2 ^ a3) << 24)
+            | ((a0 ^ mul2[a1] ^ mul3[a2] ^ a3) << 16)
+            | ((a0 ^ a1 ^ mul2[a2] ^ mul3[a3]) << 8)
+            | (mul3[a0] ^ a1 ^ a2 ^ mul2[a3])
+        )
+
+    def invmixcolword(self, w):
+        a0, a1, a2, a3 = w >> 24, (w >> 16) & 0xff, (w >> 8) & 0xff, w & 0xff
+        return (
+            ((mul14[a0] ^ mul11[a1] ^ mul13[a2] ^ mul9[a3]) << 24)
+            | ((mul9[a0] ^ mul14[a1] ^ mul11[a2] ^ mul13[a3]) << 16)
+            | ((mul13[a0] ^ mul9[a1] ^ mul14[a2] ^ mul11[a3]) << 8)
+            | (mul11[a0] ^ mul13[a1] ^ mul9[a2] ^ mul14[a3])
+        )
+
+    def mixcol_words(self, block):
+        return self.words_to_block([self.mixcolword(w) for w in self.block_to_words(block)])
+
+    def invmixcol_words(self, block):
+        return self.words_to_block([self.invmixcolword(w) for w in self.block_to_words(block)])
+
+    def invmixcol(self, block):
+        block = copy.deepcopy(block)
+        for i in range(0, 4):
+            r = self.invmixmul([block[j][i] for j in range(0, 4)])
+            for j in range(0, 4):
+                block[j][i] = r[j]
+        return block
+
     def addroundkey(self, block, roundkey):
         block = copy.deepcopy(block)
         for i in range(0, 4):
@@ -181,42 +291,236 @@ class SimpleAES:
         return block
 
     def expandkey(self, key):
-        w = [[None for j in range(0, 4)] for i in range(0, 44)]
+        nk = len(key[0])
+        assert nk in (4, 6, 8)
+        nw = 4 * (nk + 7)
+        w = [[None for j in range(0, 4)] for i in range(0, nw)]
 
-        for i in range(0, 4):
+        for i in range(0, nk):
             w[i] = [key[j][i] for j in range(0, 4)]
 
-        for i in range(4, 44):
+        for i in range(nk, nw):
             temp = w[i - 1]
-            if (0 == i % 4):
+            if (0 == i % nk):
                 temp = [temp[(j + 1) % 4] for j in range(0, 4)]
                 temp = [self.sbox[temp[j]] for j in range(0, 4)]
-                temp[0] ^= self.rcon[i / 4]
-            w[i] = [w[i - 4][j] ^ temp[j] for j in range(0, 4)]
+                temp[0] ^= self.rcon[i // nk]
+            elif nk > 6 and 4 == i % nk:
+                temp = [self.sbox[temp[j]] for j in range(0, 4)]
+            w[i] = [w[i - nk][j] ^ temp[j] for j in range(0, 4)]
 
         return w
 
-    def keysched(self, key, i):
-        w = self.expandkey(key)
-
-        r = [[None for x in range(0, 4)] for y in range(0, 4)]
+    def keyschedule(self, key):
+        if not isinstance(key, (bytes, bytearray, memoryview)):
+            key = [key[j][i] for i in range(0, len(key[0])) for j in range(0, 4)]
+        return _keyschedule(bytes(key))
 
-        for x in range(0, 4):
-            for y in range(0, 4):
-                r[y][x] = w[4 * i + x][y]
-
-        return r
+    def keysched(self, key, i):
+        return [list(r) for r in self.keyschedule(key).roundkeys[i]]
+
+    def block_to_words(self, b):
+        return [(b[0][c] << 24) | (b[1][c] << 16) | (b[2][c] << 8) | b[3][c] for c in range(0, 4)]
+
+    def words_to_block(self, w):
+        return [[(w[c] >> (24 - 8 * r)) & 0xff for c in range(0, 4)] for r in range(0, 4)]
+
+    def roundkey_words(self, key):
+        return self.keyschedule(key).words
+
+    def encwords(self, s, rk):
+        Te0, Te1, Te2, Te3, sbox = self.Te0, self.Te1, self.Te2, self.Te3, self.sbox
+        s0, s1, s2, s3 = s[0] ^ rk[0], s[1] ^ rk[1], s[2] ^ rk[2], s[3] ^ rk[3]
+        for k in range(4, len(rk) - 4, 4):
+            t0 = Te0[s0 >> 24] ^ Te1[(s1 >> 16) & 0xff] ^ Te2[(s2 >> 8) & 0xff] ^ Te3[s3 & 0xff] ^ rk[k]
+            t1 = Te0[s1 >> 24] ^ Te1[(s2 >> 16) & 0xff] ^ Te2[(s3 >> 8) & 0xff] ^ Te3[s0 & 0xff] ^ rk[k + 1]
+            t2 = Te0[s2 >> 24] ^ Te1[(s3 >> 16) & 0xff] ^ Te2[(s0 >> 8) & 0xff] ^ Te3[s1 & 0xff] ^ rk[k + 2]
+            t3 = Te0[s3 >> 24] ^ Te1[(s0 >> 16) & 0xff] ^ Te2[(s1 >> 8) & 0xff] ^ Te3[s2 & 0xff] ^ rk[k + 3]
+            s0, s1, s2, s3 = t0, t1, t2, t3
+        k = len(rk) - 4
+        return (
+            ((sbox[s0 >> 24] << 24) | (sbox[(s1 >> 16) & 0xff] << 16) | (sbox[(s2 >> 8) & 0xff] << 8) | sbox[s3 & 0xff]) ^ rk[k],
+            ((sbox[s1 >> 24] << 24) | (sbox[(s2 >> 16) & 0xff] << 16) | (sbox[(s3 >> 8) & 0xff] << 8) | sbox[s0 & 0xff]) ^ rk[k + 1],
+            ((sbox[s2 >> 24] << 24) | (sbox[(s3 >> 16) & 0xff] << 16) | (sbox[(s0 >> 8) & 0xff] << 8) | sbox[s1 & 0xff]) ^ rk[k + 2],
+            ((sbox[s3 >> 24] << 24) | (sbox[(s0 >> 16) & 0xff] << 16) | (sbox[(s1 >> 8) & 0xff] << 8) | sbox[s2 & 0xff]) ^ rk[k + 3],
+        )
+
+    def decwords(self, s, dk):
+        Td0, Td1, Td2, Td3, inv_sbox = self.Td0, self.Td1, self.Td2, self.Td3, self.inv_sbox
+        s0, s1, s2, s3 = s[0] ^ dk[0], s[1] ^ dk[1], s[2] ^ dk[2], s[3] ^ dk[3]
+        for k in range(4, len(dk) - 4, 4):
+            t0 = Td0[s0 >> 24] ^ Td1[(s3 >> 16) & 0xff] ^ Td2[(s2 >> 8) & 0xff] ^ Td3[s1 & 0xff] ^ dk[k]
+            t1 = Td0[s1 >> 24] ^ Td1[(s0 >> 16) & 0xff] ^ Td2[(s3 >> 8) & 0xff] ^ Td3[s2 & 0xff] ^ dk[k + 1]
+            t2 = Td0[s2 >> 24] ^ Td1[(s1 >> 16) & 0xff] ^ Td2[(s0 >> 8) & 0xff] ^ Td3[s3 & 0xff] ^ dk[k + 2]
+            t3 = Td0[s3 >> 24] ^ Td1[(s2 >> 16) & 0xff] ^ Td2[(s1 >> 8) & 0xff] ^ Td3[s0 & 0xff] ^ dk[k + 3]
+            s0, s1, s2, s3 = t0, t1, t2, t3
+        k = len(dk) - 4
+        return (
+            ((inv_sbox[s0 >> 24] << 24) | (inv_sbox[(s3 >> 16) & 0xff] << 16) | (inv_sbox[(s2 >> 8) & 0xff] << 8) | inv_sbox[s1 & 0xff]) ^ dk[k],
+            ((inv_sbox[s1 >> 24] << 24) | (inv_sbox[(s0 >> 16) & 0xff] << 16) | (inv_sbox[(s3 >> 8) & 0xff] << 8) | inv_sbox[s2 & 0xff]) ^ dk[k + 1],
+            ((inv_sbox[s2 >> 24] << 24) | (inv_sbox[(s1 >> 16) & 0xff] << 16) | (inv_sbox[(s0 >> 8) & 0xff] << 8) | inv_sbox[s3 & 0xff]) ^ dk[k + 2],
+            ((inv_sbox[s3 >> 24] << 24) | (inv_sbox[(s2 >> 16) & 0xff] << 16) | (inv_sbox[(s1 >> 8) & 0xff] << 8) | inv_sbox[s0 & 0xff]) ^ dk[k + 3],
+        )
+
+    def encblock_ttable(self, b, key):
+        return self.words_to_block(self.encwords(self.block_to_words(b), self.roundkey_words(key)))
+
+    def encrypt_block(self, block, key):
+        assert len(block) == 16
+        return _BLOCK.pack(*self.encwords(_BLOCK.unpack(block), self.keyschedule(key).words))
+
+    def encrypt_into(self, src, dst, key):
+        assert len(src) % 16 == 0 and len(dst) >= len(src)
+        rk = self.keyschedule(key).words
+        encwords, unpack_from, pack_into = self.encwords, _BLOCK.unpack_from, _BLOCK.pack_into
+        for off in range(0, len(src), 16):
+            pack_into(dst, off, *encwords(unpack_from(src, off), rk))
+
+    def decrypt_block(self, block, key):
+        assert len(block) == 16
+        return _BLOCK.pack(*self.decwords(_BLOCK.unpack(block), self.keyschedule(key).dec_words))
+
+    def decrypt_into(self, src, dst, key):
+        assert len(src) % 16 == 0 and len(dst) >= len(src)
+        dk = self.keyschedule(key).dec_words
+        decwords, unpack_from, pack_into = self.decwords, _BLOCK.unpack_from, _BLOCK.pack_into
+        for off in range(0, len(src), 16):
+            pack_into(dst, off, *decwords(unpack_from(src, off), dk))
 
     def encblock(self, b, key):
-        b = self.addroundkey(b, self.keysched(key, 0))
-        for i in range(1, 10):
+        if self.backend == "ttable":
+            return self.encblock_ttable(b, key)
+        return self.encblock_reference(b, key)
+
+    def encblock_reference(self, b, key):
+        rk = self.keyschedule(key).roundkeys
+        nrounds = len(rk) - 1
+        b = self.addroundkey(b, rk[0])
+        for i in range(1, nrounds):
             b = self.subbytes(b)
             b = self.shiftrows(b)
             b = self.mixcol(b)
-            b = self.addroundkey(b, self.keysched(key, i))
+            b = self.addroundkey(b, rk[i])
         b = self.subbytes(b)
         b = self.shiftrows(b)
-        b = self.addroundkey(b, self.keysched(key, 10))
+        b = self.addroundkey(b, rk[nrounds])
         return b
 
+    def decblock_ttable(self, b, key):
+        return self.words_to_block(self.decwords(self.block_to_words(b), self.keyschedule(key).dec_words))
+
+    def decblock(self, b, key):
+        if self.backend == "ttable":
+            return self.decblock_ttable(b, key)
+        return self.decblock_reference(b, key)
+
+    def decblock_reference(self, b, key):
+        rk = self.keyschedule(key).roundkeys
+        nrounds = len(rk) - 1
+        b = self.addroundkey(b, rk[nrounds])
+        for i in range(nrounds - 1, 0, -1):
+            b = self.invshiftrows(b)
+            b = self.invsubbytes(b)
+            b = self.addroundkey(b, rk[i])
+            b = self.invmixcol(b)
+        b = self.invshiftrows(b)
+        b = self.invsubbytes(b)
+        b = self.addroundkey(b, rk[0])
+        return b
 
+    def expandkeys(self, keys):
+        keys = np.asarray(keys, dtype=np.uint8)
+        assert keys.ndim == 2 and keys.shape[1] in (16, 24, 32)
+        n, nk = len(keys), keys.shape[1] // 4
+        nw = 4 * (nk + 7)
+        w = np.empty((n, nw, 4), dtype=np.uint8)
+        w[:, :nk] = keys.reshape(n, nk, 4)
+        for i in range(nk, nw):
+            temp = w[:, i - 1]
+            if 0 == i % nk:
+                temp = _SBOX[np.roll(temp, -1, axis=1)]
+                temp[:, 0] ^= self.rcon[i // nk]
+            elif nk > 6 and 4 == i % nk:
+                temp = _SBOX[temp]
+            w[:, i] = w[:, i - nk] ^ temp
+        return w.reshape(n, nw // 4, 16)
+
+    def encblocks(self, blocks, key):
+        s = np.array(blocks, dtype=np.uint8).reshape(-1, 16)
+        rk = self.roundkey_array(s, key)
+        nrounds = len(rk) - 1
+        s ^= rk[0]
+        for i in range(1, nrounds):
+            s = _SBOX[s][:, _SHIFTROWS]
+            a = s.reshape(-1, 4, 4)
+            b = _xtimes(a)
+            s = (b ^ np.roll(a ^ b, -1, axis=2) ^ np.roll(a, -2, axis=2) ^ np.roll(a, -3, axis=2)).reshape(-1, 16)
+            s ^= rk[i]
+        s = _SBOX[s][:, _SHIFTROWS]
+        s ^= rk[nrounds]
+        return np.ascontiguousarray(s)
+
+    def roundkey_array(self, blocks, key):
+        if isinstance(key, np.ndarray) and key.ndim == 2:
+            assert len(key) == len(blocks)
+            return self.expandkeys(key).transpose(1, 0, 2)
+        if isinstance(key, np.ndarray):
+            key = key.tobytes()
+        return np.frombuffer(self.keyschedule(key).roundkey_bytes, dtype=np.uint8).reshape(-1, 16)
+
+    def decblocks(self, blocks, key):
+        s = np.array(blocks, dtype=np.uint8).reshape(-1, 16)
+        rk = self.roundkey_array(s, key)
+        nrounds = len(rk) - 1
+        s ^= rk[nrounds]
+        for i in range(nrounds - 1, 0, -1):
+            s = _INV_SBOX[s][:, _INV_SHIFTROWS]
+            s ^= rk[i]
+            a = s.reshape(-1, 4, 4)
+            s = (_MUL14[a] ^ np.roll(_MUL11[a], -1, axis=2) ^ np.roll(_MUL13[a], -2, axis=2)
+                 ^ np.roll(_MUL9[a], -3, axis=2)).reshape(-1, 16)
+        s = _INV_SBOX[s][:, _INV_SHIFTROWS]
+        s ^= rk[0]
+        return np.ascontiguousarray(s)
+
+
+class KeySchedule:
+    def __init__(self, key: bytes):
+        assert len(key) in (16, 24, 32)
+        self.key = key
+        nk = len(key) // 4
+        w = SimpleAES().expandkey([[key[4 * i + j] for i in range(0, nk)] for j in range(0, 4)])
+        self.nrounds = len(w) // 4 - 1
+        self.words = tuple((x[0] << 24) | (x[1] << 16) | (x[2] << 8) | x[3] for x in w)
+        self.roundkey_bytes = bytes(b for x in w for b in x)
+        # Equivalent inverse cipher: round keys in reverse order with
+        # InvMixColumns applied to all but the first and last.
+        invmixcolword = SimpleAES().invmixcolword
+        rk = [self.words[4 * i:4 * i + 4] for i in range(self.nrounds, -1, -1)]
+        self.dec_words = rk[0] + tuple(invmixcolword(k) for r in rk[1:-1] for k in r) + rk[-1]
+        self.roundkeys = tuple(
+            tuple(tuple(w[4 * i + x][y] for x in range(0, 4)) for y in range(0, 4))
+            for i in range(0, self.nrounds + 1)
+        )
+
+
+@functools.lru_cache(maxsize=256)
+def _keyschedule(key: bytes) -> KeySchedule:
+    return KeySchedule(key)
+
+
+_BLOCK = struct.Struct(">4I")
+
+_SBOX = np.array(SimpleAES.sbox, dtype=np.uint8)
+_SHIFTROWS = np.array([4 * ((c + r) % 4) + r for c in range(0, 4) for r in range(0, 4)])
+_INV_SBOX = np.array(SimpleAES.inv_sbox, dtype=np.uint8)
+_INV_SHIFTROWS = np.array([4 * ((c - r) % 4) + r for c in range(0, 4) for r in range(0, 4)])
+_MUL9 = np.array(mul9, dtype=np.uint8)
+_MUL11 = np.array(mul11, dtype=np.uint8)
+_MUL13 = np.array(mul13, dtype=np.uint8)
+_MUL14 = np.array(mul14, dtype=np.uint8)
+
+
+def _xtimes(a):
+    # Arithmetic xtime beats a mul2 gather for whole uint8 arrays.
+    return (a << 1) ^ ((a >> 7) * np.uint8(0x1b))
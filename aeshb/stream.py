@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+import argparse
+import os
+
+import numpy as np
+
+from aeshb.simpleaes import SimpleAES
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+
+def rechunk(chunks, chunk_size=DEFAULT_CHUNK_SIZE):
+    buf = bytearray()
+    for chunk in chunks:
+        mv = memoryview(chunk).cast("B")
+        while len(mv):
+            if not buf and len(mv) >= chunk_size:
+                yield mv[:chunk_size]
+                mv = mv[chunk_size:]
+                continue
+            n = chunk_size - len(buf)
+            buf += mv[:n]
+            mv = mv[n:]
+            if len(buf) == chunk_size:
+                yield bytes(buf)
+                buf.clear()
+    if buf:
+        yield bytes(buf)
+
+
+def iter_chunks(src, chunk_size=DEFAULT_CHUNK_SIZE):
+    if isinstance(src, (str, os.PathLike)):
+        with open(src, "rb") as f:
+            yield from iter_chunks(f, chunk_size)
+        return
+    if hasattr(src, "read"):
+        while True:
+            chunk = src.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    try:
+        mv = memoryview(src).cast("B")
+    except TypeError:
+        yield from rechunk(src, chunk_size)
+        return
+    for off in range(0, len(mv), chunk_size):
+        yield mv[off:off + chunk_size]
+
+
+def ctr_blocks(counter, nblocks):
+    hi, lo = divmod(counter, 1 << 64)
+    lo = np.uint64(lo) + np.arange(nblocks, dtype=np.uint64)
+    hi = np.uint64(hi) + (lo < lo[0]).astype(np.uint64)
+    return np.stack([hi, lo], axis=1).astype(">u8").view(np.uint8)
+
+
+def iter_encrypt(src, key, mode="ecb", counter=0, chunk_size=DEFAULT_CHUNK_SIZE, aes=None):
+    assert mode in ("ecb", "ctr")
+    assert chunk_size > 0 and chunk_size % 16 == 0
+    aes = aes or SimpleAES()
+    key = bytes(key)
+    if isinstance(counter, (bytes, bytearray)):
+        counter = int.from_bytes(counter, "big")
+    # Rechunk so only the final chunk can be short; CTR relies on this for
+    # a partial last block.
+    for chunk in rechunk(iter_chunks(src, chunk_size), chunk_size):
+        data = np.frombuffer(chunk, dtype=np.uint8)
+        if mode == "ecb":
+            assert len(data) % 16 == 0, "ECB input must be a multiple of the block size"
+            yield aes.encblocks(data.reshape(-1, 16), key)
+        else:
+            nblocks = -(-len(data) // 16)
+            ks = aes.encblocks(ctr_blocks(counter, nblocks), key).reshape(-1)
+            counter = (counter + nblocks) % (1 << 128)
+            yield data ^ ks[:len(data)]
+
+
+def encrypt_stream(src, dst, key, mode="ecb", counter=0, chunk_size=DEFAULT_CHUNK_SIZE):
+    if isinstance(dst, (str, os.PathLike)):
+        with open(dst, "wb") as f:
+            return encrypt_stream(src, f, key, mode=mode, counter=counter, chunk_size=chunk_size)
+    nbytes = 0
+    for out in iter_encrypt(src, key, mode=mode, counter=counter, chunk_size=chunk_size):
+        dst.write(out.data)
+        nbytes += out.size
+    return nbytes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=["ecb", "ctr"], default="ecb")
+    parser.add_argument("--key", required=True, help="hex")
+    parser.add_argument("--counter", default="00" * 16, help="hex initial counter block (CTR)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("src")
+    parser.add_argument("dst")
+    args = parser.parse_args()
+    encrypt_stream(args.src, args.dst, bytes.fromhex(args.key), mode=args.mode,
+                   counter=bytes.fromhex(args.counter), chunk_size=args.chunk_size)
@@ -1,3 +1,6 @@
+import functools
+
+import numpy as np
 
 
 def int2bitlist(n: int, sz: int) -> list:
@@ -21,3 +24,23 @@ def run_once(fn):
             return fn(*args, **kwargs)
     wrapper.has_run = False
     return wrapper
+
+def bit_transpose(init, width, leaf_depth=16):
+    # Per-bit LUT masks for every leaf of a table: masks[leaf][bit] has bit j
+    # set iff bit `bit` of init[leaf * leaf_depth + j] is set.
+    return _bit_transpose(tuple(init), width, leaf_depth)
+
+@functools.lru_cache(maxsize=1024)
+def _bit_transpose(init, width, leaf_depth):
+    assert len(init) % leaf_depth == 0 and leaf_depth <= 64
+    nbytes = (width + 7) // 8
+    if nbytes <= 8:
+        raw = np.array(init, dtype="<u8").view(np.uint8).reshape(len(init), 8)[:, :nbytes]
+    else:
+        raw = np.frombuffer(b"".join(n.to_bytes(nbytes, "little") for n in init), dtype=np.uint8).reshape(len(init), nbytes)
+    bits = np.unpackbits(raw, axis=1, bitorder="little")[:, :width]
+    packed = np.packbits(bits.reshape(-1, leaf_depth, width), axis=1, bitorder="little").astype(np.uint64)
+    shifts = (8 * np.arange(packed.shape[1], dtype=np.uint64))[None, :, None]
+    masks = np.bitwise_or.reduce(packed << shifts, axis=1)
+    return tuple(tuple(int(m) for m in leaf) for leaf in masks)
+
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+import argparse
+
+from nmigen import *
+from nmigen_boards.arrow_deca import *
+from nmigen.build.dsl import *
+from nmigen.build.res import *
+
+from aeshb.core import AES128Core, AES128Iterative, measure
+from harnessio import HarnessIO
+
+# (description, factory) of the cores compared by --report.
+CONFIGS = [
+    ("iterative, m9k", lambda: AES128Iterative("m9k")),
+    ("iterative, rom", lambda: AES128Iterative("rom")),
+    ("iterative, rom pipelined", lambda: AES128Iterative("rom", pipelined=True)),
+    ("iterative, composite", lambda: AES128Iterative("composite")),
+    ("iterative, composite cut inv", lambda: AES128Iterative("composite", cuts=("inv",))),
+] + [(f"unrolled x{unroll}, m9k", lambda unroll=unroll: AES128Core("m9k", unroll=unroll)) for unroll in (1, 2, 5, 10)]
+
+
+def report():
+    # Cycles per block measured in simulation; LEs and M9Ks from the
+    # resource estimates. Ends with the smallest iterative core against the
+    # smallest unrolled one.
+    print(f"{'core':<32} {'cycles/block':>12} {'LEs':>6} {'M9K':>4} {'bits/cycle/kLE':>15}")
+    les = {}
+    for name, factory in CONFIGS:
+        core = factory()
+        cycles = measure(core)
+        res = core.resources()
+        les[name] = res.les
+        print(f"{name:<32} {cycles:>12.1f} {res.les:>6} {res.brams:>4} {128 / cycles / res.les * 1000:>15.3f}")
+    iterative = min((n for n in les if n.startswith("iterative")), key=les.get)
+    unrolled = min((n for n in les if n.startswith("unrolled")), key=les.get)
+    print(f"{iterative}: {les[iterative]} LEs, {les[iterative] / les[unrolled]:.0%} of {unrolled} "
+          f"({les[unrolled]} LEs)")
+
+
+class Harness(Elaboratable):
+    def __init__(self, sclk, copi, cipo, load, core):
+        self.sclk = sclk
+        self.copi = copi
+        self.cipo = cipo
+        self.load = load
+        self.core = core
+
+    def elaborate(self, platform):
+        m = Module()
+        core = self.core
+        m.submodules.core = core
+        inputs = [core.in_block, core.in_key, core.in_valid]
+        outputs = [core.out_block, core.out_valid, core.in_ready]
+        m.submodules.hio = hio = HarnessIO(self.sclk, self.copi, self.cipo, self.load, inputs=inputs, outputs=outputs)
+        return m
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--report", action="store_true", help="print cycles/block and LEs of every core")
+    parser.add_argument("--impl", choices=["m9k", "rom", "composite"], default="m9k")
+    parser.add_argument("--unroll", type=int, default=None, help="unrolled core with this many rounds (default: iterative)")
+    parser.add_argument("--build", action="store_true")
+    parser.add_argument("--prog", action="store_true")
+    args = parser.parse_args()
+    if args.report:
+        report()
+        parser.exit()
+    core = AES128Iterative(args.impl) if args.unroll is None else AES128Core(args.impl, unroll=args.unroll)
+    print(f"cycles/block {core.interval} latency {core.latency}: {core.resources()}")
+    platform = ArrowDECAPlatform()
+    platform.add_resources([
+        Resource("harness_spi", 0,
+            Subsignal("sclk", Pins("1", dir="i", conn=("gpio", 0))),
+            Subsignal("copi", Pins("2", dir="i", conn=("gpio", 0))),
+            Subsignal("cipo", Pins("3", dir="o", conn=("gpio", 0))),
+            Subsignal("load", Pins("4", dir="i", conn=("gpio", 0))),
+            Attrs(io_standard="3.3-V LVTTL"),
+        )])
+    hio_spi = platform.request("harness_spi", 0)
+    harness = Harness(hio_spi.sclk, hio_spi.copi, hio_spi.cipo, hio_spi.load, core)
+    platform.build(harness, name="aes_bench", do_build=args.build, do_program=args.prog)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+import argparse
+import random
+import time
+
+import numpy as np
+
+from aeshb.bitslice import BitslicedAES
+from aeshb.simpleaes import SimpleAES
+
+def bench_block(backend, op, blocks, key, pts):
+    fn = getattr(SimpleAES(backend=backend), f"{op}block")
+    t0 = time.perf_counter()
+    for pt in pts[:blocks]:
+        fn(pt, key)
+    return blocks / (time.perf_counter() - t0)
+
+def bench_into(op, blocks, key, seed):
+    fn = getattr(SimpleAES(), f"{op}rypt_into")
+    src = random.Random(seed).randbytes(16 * blocks)
+    dst = bytearray(len(src))
+    t0 = time.perf_counter()
+    fn(memoryview(src), memoryview(dst), key)
+    return blocks / (time.perf_counter() - t0)
+
+def bench_blocks(op, blocks, key, seed, aes=None):
+    fn = getattr(aes or SimpleAES(), f"{op}blocks")
+    pts = np.random.default_rng(seed).integers(0, 256, size=(blocks, 16), dtype=np.uint8)
+    t0 = time.perf_counter()
+    fn(pts, key)
+    return blocks / (time.perf_counter() - t0)
+
+def report(name, path, rate):
+    print(f"{name:<13} {path:>9}: {rate:12.1f} blocks/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--blocks", type=int, default=2000)
+    parser.add_argument("--batch-blocks", type=int, default=1 << 18)
+    parser.add_argument("--bitsliced-blocks", type=int, default=1 << 14)
+    parser.add_argument("--key-bits", type=int, choices=[128, 192, 256], default=128)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    aes = SimpleAES()
+    key_bytes = bytes(rng.randrange(256) for i in range(args.key_bits // 8))
+    key = [[key_bytes[4 * i + j] for i in range(len(key_bytes) // 4)] for j in range(4)]
+    pts = [aes.packed_to_hex("".join(chr(rng.randrange(256)) for i in range(16))) for j in range(args.blocks)]
+    for op in ("enc", "dec"):
+        for backend in SimpleAES.backends:
+            report(f"{op}block", backend, bench_block(backend, op, args.blocks, key, pts))
+        report(f"{op}rypt_into", "bytes", bench_into(op, args.blocks, key_bytes, args.seed))
+        report(f"{op}blocks", "numpy", bench_blocks(op, args.batch_blocks, key_bytes, args.seed))
+    # The LUT4-level S-box model, for checking rather than speed.
+    report("reference", "bitslice",
+           bench_blocks("enc", args.bitsliced_blocks, key_bytes, args.seed, aes=BitslicedAES()))
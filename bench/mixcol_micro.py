@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+import argparse
+import random
+import timeit
+
+from aeshb.simpleaes import SimpleAES
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    aes = SimpleAES()
+    block = [[rng.randrange(256) for c in range(4)] for r in range(4)]
+    words = aes.block_to_words(block)
+    cases = [
+        ("mixcol (xtime, 4x4 lists)", lambda: aes.mixcol(block)),
+        ("mixcol_words (mul2/mul3)", lambda: aes.mixcol_words(block)),
+        ("mixcolword x4 (packed)", lambda: [aes.mixcolword(w) for w in words]),
+        ("invmixcol (mul9..14, lists)", lambda: aes.invmixcol(block)),
+        ("invmixcolword x4 (packed)", lambda: [aes.invmixcolword(w) for w in words]),
+    ]
+    for name, fn in cases:
+        t = timeit.timeit(fn, number=args.number)
+        print(f"{name:<28}: {1e9 * t / args.number:10.1f} ns/block")
@@ -8,6 +8,7 @@ from nmigen.lib.io import *
 from nmigen.build.dsl import *
 from nmigen.build.res import *
 
+from aeshb.cache import instance
 from aeshb.rom import ROM16x1, ROM16x8, ROM16x16, ROM32x16, ROM128x16, ROM256x8
 from aeshb.sbox import SBoxROMLUT, SBoxROMLUTSplit2x
 from harnessio import HarnessIO
@@ -29,16 +30,17 @@ class DECA(ArrowDECAPlatform):
 
 
 class Harness(Elaboratable):
-    def __init__(self, sclk, copi, cipo, load):
+    def __init__(self, sclk, copi, cipo, load, cache=False):
         self.sclk = sclk
         self.copi = copi
         self.cipo = cipo
         self.load = load
+        self.cache = cache
 
     def elaborate(self, platform):
         m = Module()
 
-        addr = Signal(8)
+        addr = Signal(8, name="addr")
         # m.submodules.rom = rom = ROM16x1(addr, init=0xDEAD)
         # static_random = bytes.fromhex("b2c8c5875fa45462afe35753b9b70f43")
         # m.submodules.rom = rom = ROM16x8(addr, init=static_random)
@@ -48,10 +50,16 @@ class Harness(Elaboratable):
         static_random = [55646, 63376, 14390, 28262, 56632, 32885, 63997, 54808, 27358, 23338, 43832, 41591, 23587,
                          58679, 49996, 61038, 6940, 5011, 15073, 12783, 25510, 43267, 44673, 53288, 32205, 54796,
                          9062, 27053, 64764, 64249, 55318, 21154]
-        m.submodules.rom = rom = ROM32x16(addr, init=static_random, pipelined=True)
-        # m.submodules.rom = rom = ROM256x8(addr, init=SimpleAES.sbox, pipelined=True)
+        rom_cls, rom_args = ROM32x16, {"init": static_random, "pipelined": True}
+        # rom_cls, rom_args = ROM256x8, {"init": SimpleAES.sbox, "pipelined": True}
         inputs = [addr]
-        outputs = [rom.data]
+        if self.cache:
+            data = Signal(rom_cls.width, name="data")
+            m.submodules.rom = instance(rom_cls, (addr,), rom_args, inputs, [data], platform)
+        else:
+            m.submodules.rom = rom = rom_cls(addr, **rom_args)
+            data = rom.data
+        outputs = [data]
         # m.submodules.sbox = sbox = SBoxROMLUTSplit2x(addr)
         # inputs = [addr]
         # outputs = [sbox.out_byte]
@@ -65,6 +73,7 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--build", action="store_true")
     parser.add_argument("--prog", action="store_true")
+    parser.add_argument("--cache", action="store_true", help="use the cached ROM netlist instead of elaborating it")
     args = parser.parse_args()
     platform = DECA()
     platform.add_resources([
@@ -76,5 +85,5 @@ if __name__ == "__main__":
             Attrs(io_standard="3.3-V LVTTL"),
         )])
     hio_spi = platform.request("harness_spi", 0)
-    harness = Harness(hio_spi.sclk, hio_spi.copi, hio_spi.cipo, hio_spi.load)
+    harness = Harness(hio_spi.sclk, hio_spi.copi, hio_spi.cipo, hio_spi.load, cache=args.cache)
     platform.build(harness, name="sbox_bench", do_build=args.build, do_program=args.prog)
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+SUITE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests", "aeshb", "test_rom_suite.py")
+
+def run_suite(workers, vcd, select):
+    cmd = [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", SUITE]
+    if workers != 1:
+        cmd += ["-n", str(workers)]
+    if vcd:
+        cmd.append("--vcd")
+    if select:
+        cmd += ["-k", select]
+    t0 = time.perf_counter()
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    elapsed = time.perf_counter() - t0
+    summary = proc.stdout.strip().splitlines()[-1] if proc.stdout.strip() else proc.stderr.strip()
+    return elapsed, proc.returncode, summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", default="1", help="pytest-xdist workers, or auto")
+    parser.add_argument("--vcd", action="store_true", help="also time the suite with tracing on")
+    parser.add_argument("-k", dest="select", default=None, help="pytest -k expression")
+    parser.add_argument("--record", default=None, help="append results as JSON lines to this file")
+    args = parser.parse_args()
+    workers = args.workers if args.workers == "auto" else int(args.workers)
+    for vcd in (False, True) if args.vcd else (False,):
+        elapsed, rc, summary = run_suite(workers, vcd, args.select)
+        print(f"workers={workers} vcd={vcd}: {elapsed:.2f}s ({summary})")
+        if args.record:
+            with open(args.record, "a") as f:
+                f.write(json.dumps({"time": time.time(), "workers": workers, "vcd": vcd,
+                                    "seconds": round(elapsed, 3), "returncode": rc, "summary": summary}) + "\n")
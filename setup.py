@@ -4,5 +4,6 @@ setup(
     name="aes-honeybadger",
     version="0.1.0",
     packages=find_packages(),
-    install_requires=["rich"],
+    install_requires=["rich", "numpy"],
+    extras_require={"test": ["pytest", "pytest-xdist"]},
 )
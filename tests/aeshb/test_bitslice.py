@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+import numpy as np
+
+from aeshb.bitslice import BitslicedAES, from_planes, from_state, to_planes, to_state
+from aeshb.simpleaes import SimpleAES
+
+def test_planes_roundtrip():
+    blocks = np.random.default_rng(7).integers(0, 256, size=(77, 16), dtype=np.uint8)
+    assert np.array_equal(from_planes(to_planes(blocks), len(blocks)), blocks)
+    assert np.array_equal(from_state(to_state(blocks), len(blocks)), blocks)
+
+def test_sbox_planes_exhaustive():
+    bs = BitslicedAES()
+    x = np.arange(256, dtype=np.uint8)
+    planes = to_planes(np.repeat(x[:, None], 16, axis=1))[0]
+    out = from_planes([bs.sbox_planes(planes, (1 << 256) - 1)] * 16, 256)[:, 0]
+    assert out.tolist() == list(SimpleAES.sbox)
+
+def test_bitsliced_matches_encblock():
+    rng = np.random.default_rng(8)
+    pts = rng.integers(0, 256, size=(70, 16), dtype=np.uint8)
+    keys = rng.integers(0, 256, size=(70, 16), dtype=np.uint8)
+    aes = SimpleAES()
+    bs = BitslicedAES()
+    cts = bs.encblocks(pts, keys)
+    cts_1key = bs.encblocks(pts, keys[0])
+    for i in range(len(pts)):
+        for k, ct in ((keys[i], cts[i]), (keys[0], cts_1key[i])):
+            ref = aes.encblock(aes.packed_to_hex([chr(x) for x in pts[i]]), aes.packed_to_hex([chr(x) for x in k]))
+            assert aes.hex_to_packed(ref) == "".join(chr(x) for x in ct)
+
+def test_bitsliced_aes256():
+    rng = np.random.default_rng(11)
+    pts = rng.integers(0, 256, size=(65, 16), dtype=np.uint8)
+    keys = rng.integers(0, 256, size=(65, 32), dtype=np.uint8)
+    assert np.array_equal(BitslicedAES().encblocks(pts, keys), SimpleAES().encblocks(pts, keys))
@@ -0,0 +1,96 @@
+# nmigen: UnusedElaboratable=no
+import numpy as np
+import pytest
+from nmigen import *
+from nmigen.sim import Simulator, Settle
+
+from aeshb.core import NROUNDS, AES128Core, AES128Iterative, measure
+from aeshb.simpleaes import SimpleAES
+
+
+def block_to_int(b):
+    return int.from_bytes(bytes(b), "little")
+
+
+def run_core(core, blocks, keys, vcd, name, gaps=True, max_cycles=2000):
+    # Offers the blocks in order, with a gap every third cycle if gaps, and
+    # returns the cycles they were accepted and the output blocks with the
+    # cycles they were delivered.
+    m = Module()
+    m.domains.sync = ClockDomain("sync")
+    m.submodules.core = core
+    accepted, out = [], []
+    sim = Simulator(m)
+    sim.add_clock(1e-6)
+
+    def process():
+        i = 0
+        for t in range(max_cycles):
+            offer = i < len(blocks) and not (gaps and t % 3 == 2)
+            yield core.in_valid.eq(offer)
+            if offer:
+                yield core.in_block.eq(block_to_int(blocks[i]))
+                yield core.in_key.eq(block_to_int(keys[i]))
+            yield Settle()
+            if offer and (yield core.in_ready):
+                accepted.append(t)
+                i += 1
+            if (yield core.out_valid):
+                out.append(((yield core.out_block).to_bytes(16, "little"), t))
+            if len(out) == len(blocks):
+                return
+            yield
+
+    sim.add_sync_process(process)
+    with vcd(sim, name, core.ports()):
+        sim.run()
+    return accepted, out
+
+
+@pytest.mark.parametrize("impl,unroll", [("m9k", 10), ("m9k", 5), ("m9k", 2), ("m9k", 1), ("composite", 1)])
+def test_aes128_core(impl, unroll, vcd):
+    rng = np.random.default_rng(24)
+    n = 8
+    blocks = [bytes(rng.integers(0, 256, 16, dtype=np.uint8)) for i in range(n)]
+    keys = [bytes(rng.integers(0, 256, 16, dtype=np.uint8)) for i in range(n)]
+    core = AES128Core(impl, unroll=unroll)
+    accepted, out = run_core(core, blocks, keys, vcd, f"aes128_core_{impl}_{unroll}")
+    aes = SimpleAES()
+    assert [o for o, t in out] == [aes.encrypt_block(b, k) for b, k in zip(blocks, keys)]
+    assert [t - a for a, (o, t) in zip(accepted, out)] == [core.latency] * n
+    if unroll == NROUNDS:
+        assert len(accepted) == n and accepted[-1] - accepted[0] < 2 * n
+
+
+def test_aes128_core_fips197(vcd):
+    # FIPS-197 appendix C.1, checked against encblock on SimpleAES's
+    # row/column blocks.
+    aes = SimpleAES()
+    key = aes.str_to_hex("000102030405060708090a0b0c0d0e0f")
+    block = aes.str_to_hex("00112233445566778899aabbccddeeff")
+    flat = lambda b: [b[i % 4][i // 4] for i in range(16)]
+    accepted, out = run_core(AES128Core("m9k"), [flat(block)], [flat(key)], vcd, "aes128_core_fips197")
+    assert list(out[0][0]) == flat(aes.encblock(block, key))
+    assert out[0][0].hex() == "69c4e0d86a7b0430d8cdb78070b4c55a"
+
+
+@pytest.mark.parametrize("impl,kwargs", [("m9k", {}), ("rom", {}), ("composite", {"cuts": ("inv", "out")})])
+def test_aes128_iterative(impl, kwargs, vcd):
+    rng = np.random.default_rng(25)
+    blocks = [bytes(rng.integers(0, 256, 16, dtype=np.uint8)) for i in range(3)]
+    keys = [bytes(rng.integers(0, 256, 16, dtype=np.uint8)) for i in range(3)]
+    core = AES128Iterative(impl, **kwargs)
+    accepted, out = run_core(core, blocks, keys, vcd, f"aes128_iterative_{impl}", gaps=False)
+    aes = SimpleAES()
+    assert [o for o, t in out] == [aes.encrypt_block(b, k) for b, k in zip(blocks, keys)]
+    assert [t - a for a, (o, t) in zip(accepted, out)] == [core.latency] * 3
+    # Back to back: each block is accepted as the previous one leaves.
+    assert accepted[1] - accepted[0] == core.cycles
+    assert core.resources().brams == (1 if impl == "m9k" else 0)
+
+
+def test_measure():
+    assert measure(AES128Core("m9k"), nblocks=4) == 1
+    assert measure(AES128Core("m9k", unroll=2)) == 5
+    core = AES128Iterative("m9k")
+    assert measure(core) == core.interval
@@ -0,0 +1,71 @@
+# nmigen: UnusedElaboratable=no
+import random
+
+from nmigen import *
+from nmigen.hdl.ir import Fragment
+
+from aeshb.estimate import alternatives, rank
+from aeshb.resources import Resources, comb_depth, m9k_blocks
+from aeshb.rom import ROM, ROM256x8, MultiROM, MultiPortROM
+from aeshb.simpleaes import SimpleAES, mul2
+
+def count_registers(fragment):
+    n = sum(len(s) for s in fragment.drivers.get("sync", []))
+    return n + sum(count_registers(sub) for sub, name in fragment.subfragments)
+
+def plan_levels(depth, width, split):
+    return ROM(depth, width, [0] * depth, split=split).levels
+
+def test_m9k_blocks():
+    assert m9k_blocks(256, 8) == 1
+    assert m9k_blocks(256, 36) == 1
+    assert m9k_blocks(128, 16) == 1
+    assert m9k_blocks(4096, 8) == 4
+    assert m9k_blocks(8192, 9) == 8
+
+def test_comb_depth():
+    assert comb_depth(4, ()) == 5
+    assert comb_depth(4, (4,)) == 5
+    assert comb_depth(4, (0, 1, 2, 3, 4)) == 1
+    assert comb_depth(4, (1, 4)) == 3
+    assert Resources(1, 2, 3, 0, 0, 1).les == 3
+    assert Resources(1, 2, 8, 0, 0, 1).les == 8
+
+def test_rom_resources():
+    rng = random.Random(5)
+    for depth, width, split in ((16, 8, "auto"), (64, 5, "auto"), (64, 3, "width"), (256, 8, ("width",))):
+        init = [rng.randrange(2**width) for i in range(depth)]
+        for stages in range(0, plan_levels(depth, width, split) + 2):
+            rom = ROM(depth, width, init, split=split, pipeline_stages=stages)
+            res = rom.resources()
+            fragment = Fragment.get(rom, None)
+            assert res.luts == len(rom.luts)
+            assert res.luts + res.muxes == rom.les
+            assert res.registers == count_registers(fragment)
+            assert res.depth == comb_depth(rom.levels, rom.registers)
+
+def test_rank():
+    ranked = rank(SimpleAES.sbox)
+    names = [name for name, res in ranked]
+    assert names[0] == "SBoxROMLUT(inverse=False)"
+    assert ranked[0][1].brams == 1
+    assert "SBoxROMLUTSplit2x(inverse=False)" in names
+    assert not any("inverse=True" in name for name in names)
+    by_depth = rank(SimpleAES.sbox, key="depth")
+    assert [res.depth for name, res in by_depth] == sorted(res.depth for name, res in by_depth)
+    assert ROM256x8(Signal(8), SimpleAES.sbox).resources() in [res for name, res in ranked]
+
+    # Generic tables never offer the S-box memories.
+    init = [random.Random(1).randrange(2**32) for i in range(256)]
+    assert all(name.startswith("ROM(") for name, design in alternatives(init, 32))
+    assert all(res.brams == 0 for name, res in rank(init, 32, max_stages=2))
+
+def test_multirom_sharing():
+    tables = [SimpleAES.Te0, SimpleAES.Te1, SimpleAES.Te2, SimpleAES.Te3]
+    # The T-tables are byte rotations of each other and share every node.
+    assert MultiROM(tables).resources() == ROM(256, 32, SimpleAES.Te0).resources()
+    sbox = ROM256x8(Signal(8), SimpleAES.sbox).resources()
+    assert MultiROM([SimpleAES.sbox, [mul2[x] for x in SimpleAES.sbox]]).resources().les < 2 * sbox.les
+    ports = MultiPortROM([SimpleAES.sbox], 16, pipelined=True)
+    assert ports.resources().luts == 16 * sbox.luts
+    assert ports.plan.nodes is MultiROM([SimpleAES.sbox], pipelined=True).nodes
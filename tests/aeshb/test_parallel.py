@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+import numpy as np
+
+from aeshb.parallel import encrypt_parallel
+from aeshb.simpleaes import SimpleAES
+
+def test_encrypt_parallel_matches_encblocks():
+    rng = np.random.default_rng(6)
+    pts = rng.integers(0, 256, size=(1000, 16), dtype=np.uint8)
+    keys = rng.integers(0, 256, size=(1000, 16), dtype=np.uint8)
+    aes = SimpleAES()
+    ct = encrypt_parallel(pts, keys[0], workers=2, chunk_blocks=96)
+    assert np.array_equal(ct, aes.encblocks(pts, keys[0].tobytes()))
+    ct = encrypt_parallel(pts, keys, workers=3, chunk_blocks=128)
+    assert np.array_equal(ct, aes.encblocks(pts, keys))
+
+def test_encrypt_parallel_aes192_keys():
+    rng = np.random.default_rng(12)
+    pts = rng.integers(0, 256, size=(300, 16), dtype=np.uint8)
+    keys = rng.integers(0, 256, size=(300, 24), dtype=np.uint8)
+    ct = encrypt_parallel(pts, keys, workers=2, chunk_blocks=64)
+    assert np.array_equal(ct, SimpleAES().encblocks(pts, keys))
@@ -0,0 +1,54 @@
+# nmigen: UnusedElaboratable=no
+from nmigen import *
+from nmigen.sim import Simulator, Delay, Settle
+
+from aeshb import simpleaes
+from aeshb.le import LELUT4, permute_mask
+from aeshb.permute import permute_table, permuted_rom, search_permutations
+from aeshb.rom import ROM
+
+def test_permute_mask():
+    assert permute_mask(0xDEAD, (0, 1, 2, 3)) == 0xDEAD
+    assert permute_mask(0xDEAD, (1, 0, 3, 2)) == 0xBCEB
+    assert permute_mask(0xDEAD, (3, 2, 1, 0)) == 0xF6B9
+    for j in range(16):
+        d = [(j >> k) & 1 for k in range(4)]
+        assert LELUT4.simulate(d[2], d[3], d[0], d[1], mask=0xDEAD) == \
+            LELUT4.simulate(*d, mask=permute_mask(0xDEAD, (2, 3, 0, 1)))
+
+def test_permute_table():
+    init = list(range(16))
+    assert permute_table(init, (0, 1, 2, 3)) == init
+    assert permute_table(init, (1, 0, 2, 3))[:4] == [0, 2, 1, 3]
+
+def test_search_permutations():
+    res = search_permutations(simpleaes.mul3)
+    assert res.baseline == 3 and res.luts == 0
+    for init in (simpleaes.SimpleAES.Te0, simpleaes.SimpleAES.sbox):
+        res = search_permutations(init)
+        assert res.luts <= res.baseline
+        assert ROM(256, max(init).bit_length(), res.init).nluts == res.luts
+        assert search_permutations(init, exhaustive=False).luts == res.luts
+
+def test_permuted_rom():
+    # Identity leaves on a0..a3 need four LUTs, leaves on a0, a1, a4, a5 one.
+    a = lambda i, b: (i >> b) & 1
+    init = [(a(i, 4) & a(i, 0)) | (a(i, 5) & a(i, 1)) | (a(i, 3) & a(i, 2)) for i in range(64)]
+    res = search_permutations(init)
+    addr, rom = permuted_rom(init, res.perm)
+    assert rom.nluts == res.luts == 1 and res.baseline == 4
+    m = Module()
+    m.submodules.rom = rom
+
+    sim = Simulator(m)
+
+    def process():
+        for i in range(64):
+            yield addr.eq(i)
+            yield Delay(1e-6)
+            yield Settle()
+            data = yield rom.data
+            assert data == init[i]
+
+    sim.add_process(process)
+    sim.run()
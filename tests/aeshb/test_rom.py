@@ -4,10 +4,11 @@ import random
 from nmigen import *
 from nmigen.sim import Simulator, Delay, Settle
 
-from aeshb.rom import ROM16x1, ROM16x8, ROM16x16, ROM32x16, ROM128x16, ROM256x8
-from aeshb.simpleaes import SimpleAES
+from aeshb.rom import (ROM, ROM16x1, ROM16x8, ROM16x16, ROM32x16, ROM128x16, ROM256x8, MultiROM, MultiPortROM,
+                       leaf_function, minimize_leaves, pack_tables, plan_resources, plan_rom, rom_plan)
+from aeshb.simpleaes import SimpleAES, mul2
 
-def test_rom16x1():
+def test_rom16x1(vcd):
     m = Module()
     addr = Signal(4)
     m.submodules.rom = rom = ROM16x1(addr, init=0xAA55)
@@ -23,11 +24,11 @@ def test_rom16x1():
             assert data == ((rom.init >> i) & 1)
 
     sim.add_process(process)
-    with sim.write_vcd("rom16x1.vcd", "rom16x1.gtkw", traces=rom.ports()):
+    with vcd(sim, "rom16x1", rom.ports()):
         sim.run()
 
 
-def test_rom16x8():
+def test_rom16x8(vcd):
     m = Module()
     addr = Signal(4)
     static_random = bytes.fromhex("b2c8c5875fa45462afe35753b9b70f43")
@@ -44,10 +45,10 @@ def test_rom16x8():
             assert data == static_random[i]
 
     sim.add_process(process)
-    with sim.write_vcd("rom16x8.vcd", "rom16x8.gtkw", traces=rom.ports()):
+    with vcd(sim, "rom16x8", rom.ports()):
         sim.run()
 
-def test_rom16x16():
+def test_rom16x16(vcd):
     m = Module()
     addr = Signal(4)
     static_random = [34502, 10917, 31302, 39655, 62319, 3030, 62137, 43078,
@@ -65,14 +66,15 @@ def test_rom16x16():
             assert data == static_random[i]
 
     sim.add_process(process)
-    with sim.write_vcd("rom16x16.vcd", "rom16x16.gtkw", traces=rom.ports()):
+    with vcd(sim, "rom16x16", rom.ports()):
         sim.run()
 
-def test_rom32x16():
+def test_rom32x16(vcd):
     m = Module()
     addr = Signal(5)
     # init = list(range(32))
-    init = [random.randint(0, 2**16-1) for i in range(32)]
+    rng = random.Random(32)
+    init = [rng.randint(0, 2**16-1) for i in range(32)]
     m.submodules.rom = rom = ROM32x16(addr, init=init)
 
     sim = Simulator(m)
@@ -86,36 +88,72 @@ def test_rom32x16():
             assert data == init[i]
 
     sim.add_process(process)
-    with sim.write_vcd("rom32x16.vcd", "rom32x16.gtkw", traces=rom.ports()):
+    with vcd(sim, "rom32x16", rom.ports()):
         sim.run()
 
-def test_rom32x16_pipelined():
+def check_latency(rom, addrs):
+    m = Module()
+    m.domains.sync = ClockDomain("sync")
+    m.submodules.rom = rom
+
+    sim = Simulator(m)
+    sim.add_clock(1e-6)
+
+    def process():
+        for t in range(len(addrs) + rom.latency):
+            yield rom.addr.eq(addrs[t] if t < len(addrs) else 0)
+            yield Settle()
+            data = yield rom.data
+            if t >= rom.latency:
+                assert data == rom.init[addrs[t - rom.latency]]
+            yield
+
+    sim.add_sync_process(process)
+    sim.run()
+
+def test_rom32x16_pipelined(vcd):
     m = Module()
     addr = Signal(5)
     init = list(range(32))
     # init = [random.randint(0, 2**16-1) for i in range(32)]
     m.submodules.rom = rom = ROM32x16(addr, init=init, pipelined=True)
+    assert rom.latency == 2
 
     sim = Simulator(m)
     sim.add_clock(1e-6)
 
     def process():
-        for i in range(len(init)):
-            yield addr.eq(i)
+        for i in range(len(init) + rom.latency):
+            yield addr.eq(i % len(init))
+            yield Settle()
             data = yield rom.data
-            # assert data == init[i]
+            if i >= rom.latency:
+                assert data == init[i - rom.latency]
             yield
 
     sim.add_sync_process(process)
-    with sim.write_vcd("rom32x16_pipelined.vcd", "rom32x16_pipelined.gtkw", traces=rom.ports()):
+    with vcd(sim, "rom32x16_pipelined", rom.ports()):
         sim.run()
 
+def test_rom_pipeline_stages():
+    rng = random.Random(13)
+    init = [rng.randrange(2**8) for i in range(256)]
+    addrs = [rng.randrange(256) for i in range(64)]
+    for stages in range(0, 6):
+        rom = ROM(256, 8, init, pipeline_stages=stages)
+        assert rom.latency == stages and len(rom.registers) == stages
+        check_latency(rom, addrs)
+    for stages in (1, 3):
+        check_latency(ROM256x8(Signal(8), init, pipeline_stages=stages), addrs)
+    check_latency(ROM(64, 3, [n & 7 for n in init[:64]], split="width", pipeline_stages=2), [a & 63 for a in addrs])
 
-def test_rom128x16():
+
+def test_rom128x16(vcd):
     m = Module()
     addr = Signal(7)
     # init = list(range(128))
-    init = [random.randint(0, 2**16-1) for i in range(128)]
+    rng = random.Random(128)
+    init = [rng.randint(0, 2**16-1) for i in range(128)]
     m.submodules.rom = rom = ROM128x16(addr, init=init)
 
     sim = Simulator(m)
@@ -129,47 +167,175 @@ def test_rom128x16():
             assert data == init[i]
 
     sim.add_process(process)
-    with sim.write_vcd("rom128x16.vcd", "rom128x16.gtkw", traces=rom.ports()):
+    with vcd(sim, "rom128x16", rom.ports()):
         sim.run()
 
-def test_rom256x8():
+def test_rom256x8(vcd):
     m = Module()
     addr = Signal(8)
-    # init = SimpleAES.sbox
-    init = list(range(256))
+    init = SimpleAES.sbox
     m.submodules.rom = rom = ROM256x8(addr, init=init)
 
     sim = Simulator(m)
 
     def process():
-        for i in range(len(SimpleAES.sbox)):
+        for i in range(len(init)):
             yield addr.eq(i)
             yield Delay(1e-6)
             yield Settle()
             data = yield rom.data
-            # assert data == init[i]
+            assert data == init[i]
 
     sim.add_process(process)
-    with sim.write_vcd("rom256x8.vcd", "rom256x8.gtkw", traces=rom.ports()):
+    with vcd(sim, "rom256x8", rom.ports()):
         sim.run()
 
-def test_rom256x8_pipelined():
+def test_rom256x8_pipelined(vcd):
     m = Module()
     addr = Signal(8)
-    # init = SimpleAES.sbox
-    init = list(range(256))
+    init = SimpleAES.sbox
     m.submodules.rom = rom = ROM256x8(addr, init=init, pipelined=True)
+    assert rom.latency == 5
 
     sim = Simulator(m)
     sim.add_clock(1e-6)
 
     def process():
-        for i in range(len(init)):
-            yield addr.eq(i)
+        for i in range(len(init) + rom.latency):
+            yield addr.eq(i % len(init))
+            yield Settle()
             data = yield rom.data
-            # assert data == init[i]
+            if i >= rom.latency:
+                assert data == init[i - rom.latency]
             yield
 
     sim.add_sync_process(process)
-    with sim.write_vcd("rom256x8_pipelined.vcd", "rom256x8_pipelined.gtkw", traces=rom.ports()):
+    with vcd(sim, "rom256x8_pipelined", rom.ports()):
+        sim.run()
+
+
+def test_plan_rom():
+    assert plan_rom(16, 8) == (8, 0, ())
+    assert plan_rom(256, 8) == (248, 4, ("depth", "depth", "depth", "depth"))
+    assert plan_rom(256, 8, split=("width",)) == (248, 4, ("width", "depth", "depth", "depth"))
+    # Splitting below the leaf depth never pays off.
+    assert plan_rom(8, 16) == (16, 0, ())
+    assert plan_rom(64, 4, split="width") == (28, 2, ("width", "width"))
+
+def test_rom_generic():
+    rng = random.Random(11)
+    for depth, width, split in ((2, 3, "auto"), (8, 5, "auto"), (64, 5, "auto"), (64, 3, "width"), (512, 4, "auto")):
+        init = [rng.randrange(2**width) for i in range(depth)]
+        m = Module()
+        m.submodules.rom = rom = ROM(depth, width, init, split=split)
+
+        sim = Simulator(m)
+
+        def process():
+            for i in range(depth):
+                yield rom.addr.eq(i)
+                yield Delay(1e-6)
+                yield Settle()
+                data = yield rom.data
+                assert data == init[i]
+
+        sim.add_process(process)
         sim.run()
+
+def test_leaf_function():
+    assert leaf_function(0x0000) == ("const", None, False)
+    assert leaf_function(0xFFFF) == ("const", None, True)
+    assert leaf_function(0xFFFF, share_complements=False) == ("const", None, True)
+    assert leaf_function(0xAAAA) == ("wire", 0, False)
+    assert leaf_function(0xF0F0) == ("wire", 2, False)
+    assert leaf_function(0x0F0F) == ("wire", 2, True)
+    assert leaf_function(0x0F0F, share_complements=False) == ("lut", (0x0F0F, (2,)), False)
+    assert leaf_function(0x7777) == ("lut", (0x7777, (0, 1)), False)
+    assert leaf_function(0x8888) == ("lut", (0x7777, (0, 1)), True)
+    functions, luts = minimize_leaves(((0x1234, 0x1234, 0xEDCB), (0x1234, 0xAAAA, 0x0000)))
+    assert luts == ((0x1234, (0, 1, 2, 3)),)
+    assert functions[0][2] == ("lut", (0x1234, (0, 1, 2, 3)), True)
+    assert functions[1][0] == functions[0][0]
+
+def test_rom_minimized():
+    # Wires, inverted wires, constants, duplicates, complements and a
+    # two-input function, with a random bit to keep the tree honest.
+    rng = random.Random(3)
+    f = [rng.randrange(2) for i in range(64)]
+    def entry(i):
+        bits = [i & 1, ~(i >> 1) & 1, 1, 0, f[i], f[i], 1 - f[i], (i & 1) & ((i >> 2) & 1)]
+        return sum(b << k for k, b in enumerate(bits))
+    for depth in (16, 64):
+        init = [entry(i) for i in range(depth)]
+        rom = ROM(depth, 8, init)
+        res = rom.resources()
+        if depth == 16:
+            # No consumer absorbs inverters: ~d1, f, ~f, and the AND.
+            assert res.luts == 4
+        else:
+            assert res.luts < rom.leaf_width * len(rom.masks)
+        m = Module()
+        m.submodules.rom = rom
+
+        sim = Simulator(m)
+
+        def process():
+            for i in range(depth):
+                yield rom.addr.eq(i)
+                yield Delay(1e-6)
+                yield Settle()
+                data = yield rom.data
+                assert data == init[i]
+
+        sim.add_process(process)
+        sim.run()
+
+def test_multirom():
+    inits = [SimpleAES.sbox, [mul2[x] for x in SimpleAES.sbox]]
+    m = Module()
+    m.domains.sync = ClockDomain("sync")
+    m.submodules.rom = rom = MultiROM(inits, pipeline_stages=2)
+
+    sim = Simulator(m)
+    sim.add_clock(1e-6)
+
+    def process():
+        for t in range(256 + rom.latency):
+            yield rom.addr.eq(t % 256)
+            yield Settle()
+            if t >= rom.latency:
+                for k, init in enumerate(inits):
+                    data = yield rom.outputs[k]
+                    assert data == init[t - rom.latency]
+            yield
+
+    sim.add_sync_process(process)
+    sim.run()
+
+def test_multiportrom():
+    rng = random.Random(17)
+    inits = [[rng.randrange(2**8) for i in range(64)] for k in range(2)]
+    m = Module()
+    m.domains.sync = ClockDomain("sync")
+    m.submodules.rom = rom = MultiPortROM(inits, 4, pipelined=True)
+    widths, offsets, packed = pack_tables(inits)
+    assert rom.resources().les == 4 * plan_resources(rom_plan(64, sum(widths), packed, pipelined=True)).les
+    addrs = [[rng.randrange(64) for i in range(32)] for p in range(4)]
+
+    sim = Simulator(m)
+    sim.add_clock(1e-6)
+
+    def process():
+        for t in range(32 + rom.latency):
+            for p in range(4):
+                yield rom.addrs[p].eq(addrs[p][t] if t < 32 else 0)
+            yield Settle()
+            if t >= rom.latency:
+                for p in range(4):
+                    for k, init in enumerate(inits):
+                        data = yield rom.outputs[p][k]
+                        assert data == init[addrs[p][t - rom.latency]]
+            yield
+
+    sim.add_sync_process(process)
+    sim.run()
@@ -0,0 +1,70 @@
+# nmigen: UnusedElaboratable=no
+import random
+
+import numpy as np
+import pytest
+from nmigen import *
+
+from aeshb.rom import ROM, ROM16x1, ROM16x8, ROM16x16, ROM32x16, ROM128x16, ROM256x8, MultiROM
+from aeshb.romcheck import check_equivalence, check_model
+from aeshb.simpleaes import SimpleAES
+
+# name -> (depth, width, factory(init))
+GEOMETRIES = {
+    "rom16x1": (16, 1, lambda init: ROM16x1(Signal(4), init)),
+    "rom16x8": (16, 8, lambda init: ROM16x8(Signal(4), init)),
+    "rom16x16": (16, 16, lambda init: ROM16x16(Signal(4), init)),
+    "rom16x16_pipelined": (16, 16, lambda init: ROM16x16(Signal(4), init, pipelined=True)),
+    "rom32x16": (32, 16, lambda init: ROM32x16(Signal(5), init)),
+    "rom32x16_pipelined": (32, 16, lambda init: ROM32x16(Signal(5), init, pipelined=True)),
+    "rom128x16": (128, 16, lambda init: ROM128x16(Signal(7), init)),
+    "rom128x16_stages3": (128, 16, lambda init: ROM128x16(Signal(7), init, pipeline_stages=3)),
+    "rom256x8": (256, 8, lambda init: ROM256x8(Signal(8), init)),
+    "rom256x8_pipelined": (256, 8, lambda init: ROM256x8(Signal(8), init, pipelined=True)),
+    "rom64x5_width": (64, 5, lambda init: ROM(64, 5, init, split="width", pipeline_stages=2)),
+    "rom512x4": (512, 4, lambda init: ROM(512, 4, init, pipeline_stages=1)),
+    "multirom256x2x4": (256, 8, lambda init: MultiROM([[n & 15 for n in init], [n >> 4 for n in init]])),
+}
+
+# name -> table(depth, width, rng); the adversarial tables hit every leaf
+# minimization case (constants, wires, duplicates, complements) and the
+# all-identical-children mux collapse.
+TABLES = {
+    "sbox": lambda depth, width, rng: [SimpleAES.sbox[i % 256] % 2**width for i in range(depth)],
+    "random": lambda depth, width, rng: [rng.randrange(2**width) for i in range(depth)],
+    "zeros": lambda depth, width, rng: [0] * depth,
+    "ones": lambda depth, width, rng: [2**width - 1] * depth,
+    "alternating": lambda depth, width, rng: [(0x5555 if i & 1 else 0xAAAA) % 2**width for i in range(depth)],
+    "identity": lambda depth, width, rng: [i % 2**width for i in range(depth)],
+    "walking": lambda depth, width, rng: [1 << (i % width) for i in range(depth)],
+    "complements": lambda depth, width, rng: [n ^ (2**width - 1) * (i & 1)
+                                              for i, n in enumerate(rng.randrange(2**width) for i in range(depth))],
+}
+
+
+def build(geometry, table):
+    depth, width, factory = GEOMETRIES[geometry]
+    rng = random.Random(f"{geometry}/{table}")
+    return factory(TABLES[table](depth, width, rng)), rng
+
+
+@pytest.mark.parametrize("table", sorted(TABLES))
+@pytest.mark.parametrize("geometry", sorted(GEOMETRIES))
+def test_rom_model(geometry, table):
+    rom, rng = build(geometry, table)
+    addrs = np.array([rng.randrange(rom.depth) for i in range(4 * rom.depth)])
+    assert check_model(rom, np.arange(rom.depth))
+    assert check_model(rom, addrs)
+
+
+@pytest.mark.parametrize("table", sorted(TABLES))
+@pytest.mark.parametrize("geometry", sorted(GEOMETRIES))
+def test_rom_sim(geometry, table, vcd):
+    # Every address once, in a seeded random order, against the model
+    # (and through check_model above, against the table).
+    rom, rng = build(geometry, table)
+    addrs = list(range(rom.depth))
+    rng.shuffle(addrs)
+    addrs = np.array(addrs + addrs[:rom.latency])
+    trace = lambda sim: vcd(sim, f"rom_suite_{geometry}_{table}", rom.ports())
+    assert check_equivalence(rom, addrs=[addrs], trace=trace) == []
@@ -0,0 +1,59 @@
+# nmigen: UnusedElaboratable=no
+import random
+
+import numpy as np
+from nmigen import *
+
+from aeshb.le import LELUT4
+from aeshb.rom import (ROM, ROM16x1, ROM16x8, ROM16x16, ROM32x16, ROM128x16, ROM256x8, MultiROM, MultiPortROM,
+                       delay_cycles)
+from aeshb.romcheck import check_equivalence, check_model
+from aeshb.simpleaes import SimpleAES
+
+def test_delay_cycles():
+    assert list(delay_cycles(np.arange(4), 0)) == [0, 1, 2, 3]
+    assert list(delay_cycles(np.arange(4), 2)) == [0, 0, 0, 1]
+    assert list(delay_cycles(np.arange(2), 3)) == [0, 0]
+
+def test_lut_simulate_vectorized():
+    d = [np.array([(j >> k) & 1 for j in range(16)]) for k in range(4)]
+    assert list(LELUT4.simulate(*d, mask=0xDEAD)) == [(0xDEAD >> j) & 1 for j in range(16)]
+
+def test_models():
+    rng = random.Random(19)
+    addrs = np.array([rng.randrange(256) for i in range(300)])
+    r16 = [rng.randrange(2**16) for i in range(16)]
+    roms = [
+        ROM16x16(Signal(4), r16), ROM16x16(Signal(4), r16, pipelined=True),
+        ROM32x16(Signal(5), r16 * 2, pipelined=True), ROM128x16(Signal(7), r16 * 8),
+        ROM256x8(Signal(8), SimpleAES.sbox), ROM256x8(Signal(8), SimpleAES.inv_sbox, pipeline_stages=3),
+        ROM(256, 32, SimpleAES.Td0, pipeline_stages=2), ROM(2, 3, [5, 2]),
+    ]
+    for rom in roms:
+        assert check_model(rom, addrs % rom.depth)
+    rom = ROM16x8(Signal(4), bytes(range(0, 160, 10)))
+    assert list(rom.simulate(np.arange(16))) == list(range(0, 160, 10))
+
+    tables = [SimpleAES.Te0, SimpleAES.Te1, SimpleAES.Te2, SimpleAES.Te3]
+    outputs = MultiROM(tables, pipelined=True).simulate_outputs(addrs)
+    for out, table in zip(outputs, tables):
+        assert list(out[5:]) == [table[a] for a in addrs[:-5]]
+    data = MultiROM(tables * 2).simulate(addrs)
+    assert data.dtype == object and int(data[0]) >> 224 == SimpleAES.Te3[addrs[0]]
+
+def test_check_equivalence():
+    rng = random.Random(23)
+    init = [rng.randrange(2**8) for i in range(256)]
+    for stages in (0, 2, 5):
+        assert check_equivalence(ROM(256, 8, init, pipeline_stages=stages), samples=40, seed=stages) == []
+    ports = MultiPortROM([init[:64], init[64:128]], 3, pipeline_stages=1)
+    assert check_equivalence(ports, samples=40) == []
+    assert check_equivalence(ROM16x16(Signal(4), [rng.randrange(2**16) for i in range(16)], pipelined=True)) == []
+    rom = ROM16x1(Signal(4), 0xAA55)
+    assert list(rom.simulate(np.arange(16))) == [(0xAA55 >> i) & 1 for i in range(16)]
+    assert check_equivalence(rom) == []
+
+    # A model that disagrees with the hardware is reported.
+    rom = ROM(64, 4, [n & 15 for n in init[:64]])
+    rom.simulate = lambda addrs: np.zeros(len(addrs), dtype=np.uint64)
+    assert check_equivalence(rom, samples=16)
@@ -0,0 +1,134 @@
+# nmigen: UnusedElaboratable=no
+import numpy as np
+from nmigen import *
+from nmigen.sim import Simulator, Settle
+
+from aeshb import composite
+from aeshb.rom import ROM256x8
+from aeshb.sbox import SBoxComposite, SBoxROMLUTSplit, SBoxROMLUTSplit2x, SubBytes128, composite_blocks, simulate_composite
+from aeshb.simpleaes import SimpleAES, _gmul
+
+
+def test_composite_tables():
+    # simulate_composite without cuts is the combinational datapath.
+    for inverse, table in ((False, SimpleAES.sbox), (True, SimpleAES.inv_sbox)):
+        assert tuple(simulate_composite(composite_blocks(inverse), (), np.arange(256))) == table
+    for a in range(256):
+        for b in (1, 2, 3, 0x53, 0xca):
+            assert _gmul(a, b) == composite.FROM_COMPOSITE[
+                composite.composite_mul(composite.TO_COMPOSITE[a], composite.TO_COMPOSITE[b])]
+
+
+def sim_sbox(sbox, values, vcd, name):
+    m = Module()
+    m.domains.sync = ClockDomain("sync")
+    m.submodules.sbox = sbox
+    out = []
+    sim = Simulator(m)
+    sim.add_clock(1e-6)
+
+    def process():
+        for v in values:
+            yield sbox.in_byte.eq(int(v))
+            yield Settle()
+            out.append((yield sbox.out_byte))
+            yield
+
+    sim.add_sync_process(process)
+    with vcd(sim, name, sbox.ports()):
+        sim.run()
+    return out
+
+
+def test_sbox_composite(vcd):
+    # Every byte, for the forward and inverse S-box, combinational and cut
+    # at every block.
+    values = np.random.default_rng(21).permutation(256)
+    for inverse in (False, True):
+        table = np.array(SimpleAES.inv_sbox if inverse else SimpleAES.sbox)
+        for cuts in ((), ("inv",), ("delta", "mul"), SBoxComposite.cut_points):
+            sbox = SBoxComposite(Signal(8), inverse=inverse, cuts=cuts)
+            seq = np.concatenate([values, values[:sbox.latency]])
+            model = sbox.simulate(seq)
+            assert list(model[sbox.latency:]) == list(table[values])
+            out = sim_sbox(sbox, seq, vcd, f"sbox_composite_{int(inverse)}_{len(cuts)}")
+            assert out[sbox.latency:] == list(model[sbox.latency:])
+
+
+def test_sbox_composite_resources():
+    rom = ROM256x8(Signal(8), SimpleAES.sbox).resources()
+    comb = SBoxComposite(Signal(8)).resources()
+    piped = SBoxComposite(Signal(8), pipelined=True).resources()
+    assert comb.les < rom.les and comb.registers == 0
+    assert piped.les == comb.les and piped.depth < comb.depth
+    assert SBoxComposite(Signal(8), pipelined=True).latency == len(SBoxComposite.cut_points)
+
+
+def test_sbox_split(vcd):
+    # The model against the table and the simulation for every bank count,
+    # unregistered, registered at the bank outputs and fully pipelined.
+    values = np.random.default_rng(22).permutation(256)
+    for n_banks in (2, 4, 8, 16):
+        levels = n_banks.bit_length() - 1
+        for stages in sorted({0, 1, levels + 1}):
+            sbox = SBoxROMLUTSplit(Signal(8), n_banks=n_banks, register_stages=stages, inverse=n_banks == 4)
+            seq = np.concatenate([values, values[:sbox.latency]])
+            model = sbox.simulate(seq)
+            assert list(model[sbox.latency:]) == [sbox.table[v] for v in values]
+            out = sim_sbox(sbox, seq, vcd, f"sbox_split_{n_banks}_{stages}")
+            assert out[sbox.latency:] == list(model[sbox.latency:])
+
+
+def test_sbox_split_resources():
+    res = [SBoxROMLUTSplit(Signal(8), n_banks=n, register_stages=0).resources() for n in (2, 4, 8, 16)]
+    assert [r.muxes for r in res] == [8, 24, 56, 120]
+    assert [r.depth for r in res] == [1, 2, 3, 4]
+    piped = SBoxROMLUTSplit(Signal(8), n_banks=16, register_stages=5)
+    assert piped.latency == 6 and piped.resources().depth == 1
+    split2x = SBoxROMLUTSplit2x(Signal(8))
+    assert split2x.registers == (0,) and split2x.latency == 2 and split2x.resources().depth == 1
+
+
+def test_subbytes128(vcd):
+    # Random states through every implementation, against SimpleAES and
+    # the model, with in_valid following the data.
+    rng = np.random.default_rng(23)
+    aes = SimpleAES()
+    for impl, inverse, kwargs in [("m9k", False, {}), ("m9k", True, {}), ("rom", False, {"pipelined": True}),
+                                  ("composite", True, {"cuts": ("inv",)})]:
+        sub = SubBytes128(inverse=inverse, impl=impl, **kwargs)
+        states = rng.integers(0, 256, (12, 16))
+        valid = rng.integers(0, 2, 12)
+        model = sub.simulate(states)
+        expected = aes.invsubbytes if inverse else aes.subbytes
+        for t in range(12 - sub.latency):
+            assert list(model[t + sub.latency]) == expected([list(states[t])])[0]
+
+        m = Module()
+        m.domains.sync = ClockDomain("sync")
+        m.submodules.sub = sub
+        out = []
+        sim = Simulator(m)
+        sim.add_clock(1e-6)
+
+        def process():
+            for state, v in zip(states, valid):
+                yield sub.in_state.eq(int.from_bytes(bytes(int(b) for b in state), "little"))
+                yield sub.in_valid.eq(int(v))
+                yield Settle()
+                out.append(((yield sub.out_state), (yield sub.out_valid)))
+                yield
+
+        sim.add_sync_process(process)
+        with vcd(sim, f"subbytes128_{impl}_{int(inverse)}", sub.ports()):
+            sim.run()
+        for t in range(sub.latency, 12):
+            assert list(out[t][0].to_bytes(16, "little")) == list(model[t])
+            assert out[t][1] == valid[t - sub.latency]
+
+
+def test_subbytes128_resources():
+    assert SubBytes128(impl="m9k").resources().brams == 8
+    rom = ROM256x8(Signal(8), SimpleAES.sbox).resources()
+    assert SubBytes128(impl="rom").resources().les == 16 * rom.les
+    assert SubBytes128(impl="composite").resources().les < 16 * rom.les
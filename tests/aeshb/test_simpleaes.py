@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+import random
+
+import numpy as np
+
+from aeshb.simpleaes import SimpleAES
+
+# FIPS-197 Appendix C.1
+FIPS197_KEY = "000102030405060708090A0B0C0D0E0F"
+FIPS197_PT = "00112233445566778899AABBCCDDEEFF"
+FIPS197_CT = "69C4E0D86A7B0430D8CDB78070B4C55A"
+
+def random_hex(rng, nbytes):
+    return "".join("%02X" % rng.randrange(256) for i in range(nbytes))
+
+def test_encblock_fips197():
+    for backend in SimpleAES.backends:
+        aes = SimpleAES(backend=backend)
+        ct = aes.encblock(aes.str_to_hex(FIPS197_PT), aes.str_to_hex(FIPS197_KEY))
+        assert aes.hex_to_str(ct) == FIPS197_CT
+
+def test_encblock_ttable_matches_reference():
+    rng = random.Random(0x5B0C5)
+    ref = SimpleAES(backend="reference")
+    tt = SimpleAES(backend="ttable")
+    for i in range(64):
+        key = ref.str_to_hex(random_hex(rng, 16))
+        pt = ref.str_to_hex(random_hex(rng, 16))
+        assert tt.encblock(pt, key) == ref.encblock(pt, key)
+
+def test_keyschedule_cached():
+    aes = SimpleAES()
+    key = aes.str_to_hex("2B7E151628AED2A6ABF7158809CF4F3C")
+    ks = aes.keyschedule(key)
+    assert ks is aes.keyschedule(bytes.fromhex("2B7E151628AED2A6ABF7158809CF4F3C"))
+    assert ks.nrounds == 10
+    assert aes.hex_to_str(aes.keysched(key, 10)) == "D014F9A8C9EE2589E13F0CC8B6630CA6"
+    assert ks.words[43] == 0xB6630CA6
+
+def test_encblocks_matches_encblock():
+    rng = np.random.default_rng(0x5B0C5)
+    aes = SimpleAES(backend="ttable")
+    pts = rng.integers(0, 256, size=(256, 16), dtype=np.uint8)
+    keys = rng.integers(0, 256, size=(256, 16), dtype=np.uint8)
+    cts = aes.encblocks(pts, keys)
+    cts_1key = aes.encblocks(pts, keys[0])
+    for i in range(len(pts)):
+        for k, ct in ((keys[i], cts[i]), (keys[0], cts_1key[i])):
+            ref = aes.encblock(aes.packed_to_hex([chr(x) for x in pts[i]]), aes.packed_to_hex([chr(x) for x in k]))
+            assert aes.hex_to_packed(ref) == "".join(chr(x) for x in ct)
+
+def test_encblocks_fips197():
+    aes = SimpleAES()
+    pt = np.frombuffer(bytes.fromhex(FIPS197_PT), dtype=np.uint8).reshape(1, 16)
+    ct = aes.encblocks(pt, bytes.fromhex(FIPS197_KEY))
+    assert ct.tobytes() == bytes.fromhex(FIPS197_CT)
+
+def test_encrypt_block_bytes():
+    aes = SimpleAES()
+    key = bytes.fromhex(FIPS197_KEY)
+    assert aes.encrypt_block(bytes.fromhex(FIPS197_PT), key) == bytes.fromhex(FIPS197_CT)
+    assert aes.encrypt_block(memoryview(bytearray.fromhex(FIPS197_PT)), bytearray(key)) == bytes.fromhex(FIPS197_CT)
+
+def test_encrypt_into_matches_encblocks():
+    rng = np.random.default_rng(4)
+    aes = SimpleAES()
+    key = bytes(rng.integers(0, 256, size=16, dtype=np.uint8))
+    pts = rng.integers(0, 256, size=(32, 16), dtype=np.uint8)
+    out = bytearray(pts.size)
+    aes.encrypt_into(memoryview(pts.tobytes()), memoryview(out), key)
+    assert bytes(out) == aes.encblocks(pts, key).tobytes()
+
+def test_inv_sbox():
+    for i in range(256):
+        assert SimpleAES.inv_sbox[SimpleAES.sbox[i]] == i
+
+def test_decblock_fips197():
+    for backend in SimpleAES.backends:
+        aes = SimpleAES(backend=backend)
+        pt = aes.decblock(aes.str_to_hex(FIPS197_CT), aes.str_to_hex(FIPS197_KEY))
+        assert aes.hex_to_str(pt) == FIPS197_PT
+    aes = SimpleAES()
+    assert aes.decrypt_block(bytes.fromhex(FIPS197_CT), bytes.fromhex(FIPS197_KEY)) == bytes.fromhex(FIPS197_PT)
+
+def test_decrypt_roundtrip():
+    rng = np.random.default_rng(9)
+    aes = SimpleAES()
+    pts = rng.integers(0, 256, size=(64, 16), dtype=np.uint8)
+    keys = rng.integers(0, 256, size=(64, 16), dtype=np.uint8)
+    cts = aes.encblocks(pts, keys)
+    assert np.array_equal(aes.decblocks(cts, keys), pts)
+    assert np.array_equal(aes.decblocks(aes.encblocks(pts, keys[0]), keys[0]), pts)
+    out = bytearray(pts.size)
+    aes.decrypt_into(aes.encblocks(pts, keys[1]).tobytes(), out, keys[1].tobytes())
+    assert bytes(out) == pts.tobytes()
+    ref = SimpleAES(backend="reference")
+    for i in range(8):
+        key = ref.packed_to_hex([chr(x) for x in keys[i]])
+        ct = ref.packed_to_hex([chr(x) for x in cts[i]])
+        assert ref.hex_to_packed(ref.decblock(ct, key)) == "".join(chr(x) for x in pts[i])
+
+# FIPS-197 Appendix C.2 and C.3
+FIPS197_KEY_CT = [
+    ("000102030405060708090A0B0C0D0E0F1011121314151617", "DDA97CA4864CDFE06EAF70A0EC0D7191"),
+    ("000102030405060708090A0B0C0D0E0F101112131415161718191A1B1C1D1E1F", "8EA2B7CA516745BFEAFC49904B496089"),
+]
+
+def key_matrix(key):
+    nk = len(key) // 4
+    return [[key[4 * i + j] for i in range(nk)] for j in range(4)]
+
+def test_aes192_aes256_fips197():
+    for key_hex, ct_hex in FIPS197_KEY_CT:
+        key = bytes.fromhex(key_hex)
+        assert SimpleAES().keyschedule(key).nrounds == len(key) // 4 + 6
+        for backend in SimpleAES.backends:
+            aes = SimpleAES(backend=backend)
+            ct = aes.encblock(aes.str_to_hex(FIPS197_PT), key_matrix(key))
+            assert aes.hex_to_str(ct) == ct_hex
+            assert aes.hex_to_str(aes.decblock(ct, key_matrix(key))) == FIPS197_PT
+        aes = SimpleAES()
+        assert aes.encrypt_block(bytes.fromhex(FIPS197_PT), key) == bytes.fromhex(ct_hex)
+        assert aes.decrypt_block(bytes.fromhex(ct_hex), key) == bytes.fromhex(FIPS197_PT)
+        pt = np.frombuffer(bytes.fromhex(FIPS197_PT), dtype=np.uint8).reshape(1, 16)
+        assert aes.encblocks(pt, key).tobytes() == bytes.fromhex(ct_hex)
+        keys = np.frombuffer(key, dtype=np.uint8).reshape(1, -1)
+        assert aes.encblocks(pt, keys).tobytes() == bytes.fromhex(ct_hex)
+
+def test_encblocks_per_block_keys_all_sizes():
+    rng = np.random.default_rng(10)
+    aes = SimpleAES()
+    pts = rng.integers(0, 256, size=(32, 16), dtype=np.uint8)
+    for key_len in (16, 24, 32):
+        keys = rng.integers(0, 256, size=(32, key_len), dtype=np.uint8)
+        cts = aes.encblocks(pts, keys)
+        for i in range(len(pts)):
+            assert cts[i].tobytes() == aes.encrypt_block(pts[i].tobytes(), keys[i].tobytes())
+        assert np.array_equal(aes.decblocks(cts, keys), pts)
+
+def test_mixcolword_matches_mixcol():
+    rng = random.Random(13)
+    aes = SimpleAES()
+    for i in range(64):
+        block = aes.str_to_hex(random_hex(rng, 16))
+        assert aes.mixcol_words(block) == aes.mixcol(block)
+        assert aes.invmixcol_words(block) == aes.invmixcol(block)
+        assert aes.invmixcol_words(aes.mixcol_words(block)) == block
+    # FIPS-197 section 5.1.3 / common MixColumns test column
+    assert aes.mixcolword(0xDB135345) == 0x8E4DA1BC
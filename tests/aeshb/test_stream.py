@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+import io
+import mmap
+
+import numpy as np
+
+from aeshb.simpleaes import SimpleAES
+from aeshb.stream import encrypt_stream, iter_encrypt
+
+# NIST SP 800-38A F.5.1 CTR-AES128.Encrypt
+SP800_38A_KEY = bytes.fromhex("2B7E151628AED2A6ABF7158809CF4F3C")
+SP800_38A_CTR = bytes.fromhex("F0F1F2F3F4F5F6F7F8F9FAFBFCFDFEFF")
+SP800_38A_PT = bytes.fromhex("6BC1BEE22E409F96E93D7E117393172AAE2D8A571E03AC9C9EB76FAC45AF8E51")
+SP800_38A_CT = bytes.fromhex("874D6191B620E3261BEF6864990DB6CE9806F66B7970FDFF8617187BB9FFFDFF")
+
+def test_ctr_sp800_38a():
+    out = io.BytesIO()
+    encrypt_stream(SP800_38A_PT, out, SP800_38A_KEY, mode="ctr", counter=SP800_38A_CTR, chunk_size=16)
+    assert out.getvalue() == SP800_38A_CT
+
+def test_ctr_partial_block():
+    out = io.BytesIO()
+    encrypt_stream([SP800_38A_PT[:7], SP800_38A_PT[7:21]], out, SP800_38A_KEY, mode="ctr", counter=SP800_38A_CTR)
+    assert out.getvalue() == SP800_38A_CT[:21]
+
+def test_ecb_sources(tmp_path):
+    rng = np.random.default_rng(5)
+    key = bytes(rng.integers(0, 256, size=16, dtype=np.uint8))
+    pt = rng.integers(0, 256, size=(100, 16), dtype=np.uint8)
+    expected = SimpleAES().encblocks(pt, key).tobytes()
+    src_path = tmp_path / "pt.bin"
+    src_path.write_bytes(pt.tobytes())
+    dst_path = tmp_path / "ct.bin"
+    assert encrypt_stream(src_path, dst_path, key, chunk_size=64) == len(expected)
+    assert dst_path.read_bytes() == expected
+    with open(src_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        assert b"".join(c.tobytes() for c in iter_encrypt(mm, key, chunk_size=320)) == expected
+    data = pt.tobytes()
+    chunks = (data[i:i + 37] for i in range(0, len(data), 37))
+    assert b"".join(c.tobytes() for c in iter_encrypt(chunks, key, chunk_size=48)) == expected
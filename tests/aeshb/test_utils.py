@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+import random
+
+from aeshb.utils import bit_transpose
+
+def naive_masks(init, width, leaf_depth):
+    masks = []
+    for leaf in range(len(init) // leaf_depth):
+        leaf_masks = [0] * width
+        for i in range(width):
+            for j in range(leaf_depth):
+                leaf_masks[i] |= ((init[leaf * leaf_depth + j] >> i) & 1) << j
+        masks.append(tuple(leaf_masks))
+    return tuple(masks)
+
+def test_bit_transpose():
+    rng = random.Random(12)
+    for depth, width, leaf_depth in ((16, 1, 16), (16, 8, 16), (256, 32, 16), (64, 70, 16), (8, 5, 8), (128, 16, 64)):
+        init = [rng.randrange(2**width) for i in range(depth)]
+        assert bit_transpose(init, width, leaf_depth) == naive_masks(init, width, leaf_depth)
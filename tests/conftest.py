@@ -0,0 +1,23 @@
+import contextlib
+import os
+
+import pytest
+
+
+def pytest_addoption(parser):
+    parser.addoption("--vcd", action="store_true", default=bool(os.environ.get("AESHB_VCD")),
+                     help="write a VCD/GTKW trace for every simulation test")
+
+
+@pytest.fixture
+def vcd(request):
+    # with vcd(sim, "name", traces): traces the simulation only with --vcd;
+    # writing traces dominates the run time of the simulation tests.
+    enabled = request.config.getoption("--vcd")
+
+    def trace(sim, name, traces=()):
+        if not enabled:
+            return contextlib.nullcontext()
+        return sim.write_vcd(f"{name}.vcd", f"{name}.gtkw", traces=traces)
+
+    return trace